@@ -0,0 +1,145 @@
+"""
+Helper bersama untuk breakdown_shift_kelas.py dan breakdown_shift_kelas_by_hari.py.
+
+Dataset: 180226 Jadwal SIRAMA - baru.xlsx
+Shift yang awalnya range per matakuliah (mis. 06.30 - 09.30) di-breakdown
+menjadi slot per jam (06.30, 07.30, 08.30, ...); kedua script hanya beda urutan output.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+
+from sirama_common import PANDAS_VERSION, extract_shift, open_excel
+
+# GroupBy.first(skipna=...) baru ada sejak pandas 2.2.1 (hanya major.minor yang dicek,
+# jadi 2.2.x ikut memakai fallback head(1) yang hasilnya sama)
+GROUPBY_FIRST_HAS_SKIPNA = PANDAS_VERSION >= (2, 3)
+
+# -----------------------------------------------------------------------------
+# Konfigurasi
+# -----------------------------------------------------------------------------
+BASE_DIR = Path(__file__).resolve().parent
+EXCEL_PATH = BASE_DIR / "180226 Jadwal SIRAMA - baru.xlsx"
+
+HARI_ORDER = ["SENIN", "SELASA", "RABU", "KAMIS", "JUMAT", "SABTU"]
+# Slot per jam: 06.30 s/d 18.30
+SLOT_HOURS = list(range(6, 19))
+SLOT_STRS = [f"{h:02d}.30" for h in SLOT_HOURS]
+SLOT_DTYPE = pd.CategoricalDtype(SLOT_STRS, ordered=True)
+# Kolom Master Jadwal yang dipakai untuk breakdown
+JADWAL_COLS = ["RUANGAN", "HARI", "SHIFT", "NAMA MATA KULIAH", "KELAS", "DOSEN"]
+# Hari sebagai kategori berurutan: merge/sort cukup pakai kode int
+HARI_DTYPE = pd.CategoricalDtype(HARI_ORDER, ordered=True)
+
+
+# -----------------------------------------------------------------------------
+# Helpers
+# -----------------------------------------------------------------------------
+def parse_shift_series(shift_series: pd.Series) -> pd.DataFrame:
+    """Parse SHIFT (mis. '13:30:00 - 15:30:00') -> kolom h1, m1 dan start/end dalam detik sejak 00:00."""
+    t = extract_shift(shift_series)
+    return pd.DataFrame(
+        {
+            "h1": t["h1"],
+            "m1": t["m1"],
+            "start": t["h1"] * 3600 + t["m1"] * 60 + t["s1"],
+            "end": t["h2"] * 3600 + t["m2"] * 60 + t["s2"],
+        }
+    )
+
+
+# -----------------------------------------------------------------------------
+# Load & process
+# -----------------------------------------------------------------------------
+def load_data(path: Path) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Load sheet Master Jadwal SIRAMA dan Master Ruangan TUS."""
+    xl = open_excel(path)
+    # Dua sheet dalam satu panggilan (usecols = gabungan kolom keduanya)
+    wanted = set(JADWAL_COLS) | {"Nama Ruang"}
+    sheets = pd.read_excel(
+        xl,
+        sheet_name=["Master Jadwal SIRAMA", "Master Ruangan TUS"],
+        usecols=lambda c: c in wanted,
+    )
+    jadwal = sheets["Master Jadwal SIRAMA"]
+    ruang = sheets["Master Ruangan TUS"]
+    # HARI di luar HARI_ORDER (MINGGU, huruf kecil, spasi) dikosongkan dulu: tidak ikut merge,
+    # dan cast langsung ke kategori dengan nilai asing sudah deprecated di pandas
+    hari = jadwal["HARI"]
+    jadwal["HARI"] = pd.Categorical(hari.where(hari.isin(HARI_ORDER)), dtype=HARI_DTYPE)
+    return jadwal, ruang
+
+
+def build_filled_slots(jadwal: pd.DataFrame) -> pd.DataFrame:
+    """Breakdown setiap baris jadwal (range SHIFT) menjadi baris per slot jam.
+    Hanya slot yang ada di grid (jam SLOT_HOURS, menit 30) yang disimpan.
+    """
+    t = parse_shift_series(jadwal["SHIFT"])
+    # Slot per jam dari start sampai sebelum end; 0 slot jika SHIFT tidak valid
+    n_slots = ((t["end"] - t["start"] + 3599) // 3600).clip(lower=0).fillna(0)
+    jam_awal = t["h1"].fillna(0)
+    filled = (
+        jadwal.assign(
+            _jam=[list(range(h, h + n)) for h, n in zip(jam_awal, n_slots)],
+            _menit=t["m1"],
+        )
+        .explode("_jam", ignore_index=True)
+        .dropna(subset=["_jam"])
+    )
+    jam = filled["_jam"].astype(int)
+    di_grid = filled["_menit"].eq(30) & jam.between(SLOT_HOURS[0], SLOT_HOURS[-1])
+    filled = filled[di_grid]
+    shift = pd.Series(
+        pd.Categorical.from_codes(jam[di_grid] - SLOT_HOURS[0], dtype=SLOT_DTYPE),
+        index=filled.index,
+    )
+    return pd.DataFrame(
+        {
+            "Ruang Kelas": filled["RUANGAN"],
+            "Hari": filled["HARI"],
+            "Shift": shift,
+            "MK": filled["NAMA MATA KULIAH"],
+            "Kelas": filled["KELAS"],
+            "Dosen": filled["DOSEN"],
+        }
+    ).reset_index(drop=True)
+
+
+def build_full_grid(
+    ruang_df: pd.DataFrame, all_slots: list[str]
+) -> pd.DataFrame:
+    """Semua kombinasi (Ruang Kelas, Hari, Shift)."""
+    ruang_list = (
+        ruang_df["Nama Ruang"].dropna().astype(str).str.strip().unique().tolist()
+    )
+    return pd.MultiIndex.from_product(
+        [ruang_list, pd.CategoricalIndex(HARI_ORDER, dtype=HARI_DTYPE),
+         pd.CategoricalIndex(all_slots, dtype=SLOT_DTYPE)],
+        names=["Ruang Kelas", "Hari", "Shift"],
+    ).to_frame(index=False)
+
+
+def run_breakdown(
+    jadwal: pd.DataFrame, ruang: pd.DataFrame, sort_by: list[str]
+) -> pd.DataFrame:
+    """Gabung grid penuh dengan slot terisi; MK kosong = belum terisi. Hasil diurut per sort_by."""
+    keys = ["Ruang Kelas", "Hari", "Shift"]
+    # Satu baris per slot: ambil baris jadwal pertama (skipna=False agar MK/Kelas/Dosen
+    # tidak tercampur dari baris lain)
+    grouped = build_filled_slots(jadwal).groupby(
+        keys, as_index=False, sort=False, observed=True
+    )
+    if GROUPBY_FIRST_HAS_SKIPNA:
+        filled = grouped.first(skipna=False)
+    else:
+        # pandas lama: baris pertama per slot apa adanya (NaN tidak diisi dari baris lain)
+        filled = grouped.head(1)
+    grid = build_full_grid(ruang, SLOT_STRS)
+    merged = grid.merge(filled, on=keys, how="left")
+    merged["MK"] = merged["MK"].fillna("")
+    merged["Kelas"] = merged["Kelas"].fillna("")
+    merged["Dosen"] = merged["Dosen"].fillna("")
+    merged = merged.sort_values(sort_by).reset_index(drop=True)
+    return merged
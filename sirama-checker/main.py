@@ -5,11 +5,23 @@ Output: file Excel (satu sheet per aturan + ringkasan).
 """
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import time
+from importlib.util import find_spec
 from pathlib import Path
 
 import pandas as pd
 
+from sirama_common import PANDAS_VERSION, extract_shift, open_excel
+
+if PANDAS_VERSION < (3, 0):
+    # Copy-on-Write (selalu aktif sejak pandas 3.0): subset/assign tidak menyalin
+    # kolom sampai benar-benar diubah, jadi .copy() defensif tidak diperlukan
+    pd.set_option("mode.copy_on_write", True)
+    # Kolom teks pakai string dtype berbasis Arrow (default pandas 3.0 bila pyarrow ada)
+    if PANDAS_VERSION >= (2, 1) and find_spec("pyarrow") is not None:
+        pd.set_option("future.infer_string", True)
+
 # -----------------------------------------------------------------------------
 # Konfigurasi
 # -----------------------------------------------------------------------------
@@ -20,77 +32,38 @@ RUANG_PATH = BASE_DIR / "030226 ruang kelas .xlsx"
 
 MAGHRIB_START = time(17, 30)
 MAGHRIB_END = time(19, 30)
+MAGHRIB_START_MIN = MAGHRIB_START.hour * 60 + MAGHRIB_START.minute
+MAGHRIB_END_MIN = MAGHRIB_END.hour * 60 + MAGHRIB_END.minute
+
+# Kolom yang dipakai dari tiap sheet (sisanya tidak perlu dibaca)
+COURSE_COLS = ["UID", "MATA KULIAH", "KODE KULIAH", "KELAS", "DOSEN/TIM DOSEN", "PROGRAM STUDI", "SKS"]
+JADWAL_COLS = ["UID", "HARI", "SHIFT", "RUANGAN", "NAMA MATA KULIAH", "KELAS", "DOSEN"]
 
 
 # -----------------------------------------------------------------------------
 # Helpers
 # -----------------------------------------------------------------------------
-def parse_shift_to_duration(shift_series: pd.Series) -> pd.Series:
-    """Parse kolom SHIFT (e.g. '13:30:00 - 16:30:00') -> durasi dalam jam (float)."""
-    def _parse(s):
-        if pd.isna(s) or not isinstance(s, str):
-            return None
-        parts = s.split("-", 1)
-        if len(parts) != 2:
-            return None
-        start_s = parts[0].strip().replace(" ", "")
-        end_s = parts[1].strip().replace(" ", "")
-        for fmt in ("%H:%M:%S", "%H:%M"):
-            try:
-                from datetime import datetime
-                t1 = datetime.strptime(start_s, fmt).time()
-                t2 = datetime.strptime(end_s, fmt).time()
-                # duration in hours
-                h1, m1 = t1.hour, t1.minute
-                h2, m2 = t2.hour, t2.minute
-                return (h2 - h1) + (m2 - m1) / 60.0
-            except ValueError:
-                continue
-        return None
-
-    return shift_series.map(_parse)
-
-
-def parse_shift_times(shift_series: pd.Series) -> tuple[pd.Series, pd.Series]:
-    """Return (start_time, end_time) as time objects (or None)."""
-    def _parse(s):
-        if pd.isna(s) or not isinstance(s, str):
-            return None, None
-        parts = s.split("-", 1)
-        if len(parts) != 2:
-            return None, None
-        start_s = parts[0].strip().replace(" ", "")
-        end_s = parts[1].strip().replace(" ", "")
-        from datetime import datetime
-        t1 = t2 = None
-        for fmt in ("%H:%M:%S", "%H:%M"):
-            try:
-                t1 = datetime.strptime(start_s, fmt).time()
-                t2 = datetime.strptime(end_s, fmt).time()
-                break
-            except ValueError:
-                continue
-        return t1, t2
-
-    starts = shift_series.map(lambda s: _parse(s)[0])
-    ends = shift_series.map(lambda s: _parse(s)[1])
-    return starts, ends
-
-
-def overlaps_maghrib(start_t: time | None, end_t: time | None) -> bool:
-    if start_t is None or end_t is None:
-        return False
-    return start_t < MAGHRIB_END and end_t > MAGHRIB_START
+def parse_shift_columns(shift_series: pd.Series) -> pd.DataFrame:
+    """Parse SHIFT sekali -> kolom _START_MIN, _END_MIN (menit sejak 00:00) dan _DUR_HR (jam)."""
+    t = extract_shift(shift_series)[["h1", "m1", "h2", "m2"]].astype("Int16")
+    return pd.DataFrame(
+        {
+            "_START_MIN": t["h1"] * 60 + t["m1"],
+            "_END_MIN": t["h2"] * 60 + t["m2"],
+            "_DUR_HR": ((t["h2"] - t["h1"]) + (t["m2"] - t["m1"]) / 60.0).astype("float64"),
+        }
+    )
 
 
 def normalize_ruangan(ruangan_series: pd.Series) -> pd.Series:
     """Normalisasi nama ruangan: strip, uppercase, hilangkan semua spasi."""
-    return (
-        ruangan_series.astype(str)
-        .str.strip()
-        .str.upper()
-        .str.replace(r"\s+", "", regex=True)
-    )
+    s = ruangan_series.astype(str)
+    # split/join hanya untuk nilai yang ada: pada kolom tanpa string (semua NaN),
+    # hasil split bukan list sehingga .str.join gagal
+    present = s.notna()
+    out = s.copy()
+    out[present] = s[present].str.upper().str.split().str.join("").to_numpy()
+    return out
 
 
 def extract_angkatan(kelas: str) -> str:
@@ -101,24 +74,42 @@ def extract_angkatan(kelas: str) -> str:
     return "-".join(parts[:2]) if len(parts) >= 2 else str(kelas)
 
 
+def extract_angkatan_series(kelas_series: pd.Series) -> pd.Series:
+    """Versi vektor dari extract_angkatan untuk satu kolom KELAS."""
+    s = kelas_series.astype("string")
+    angkatan = s.str.strip().str.extract(r"^([^-]*-[^-]*)", expand=False)
+    return angkatan.fillna(s).fillna("")
+
+
 # -----------------------------------------------------------------------------
 # Load data
 # -----------------------------------------------------------------------------
-def load_sirama(path: Path) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    xl = pd.ExcelFile(path)
-    course = pd.read_excel(xl, sheet_name="Course")
-    jadwal = pd.read_excel(xl, sheet_name="Jadwal")
-    dosen_all = pd.read_excel(xl, sheet_name="Dosen ALL")
-    return course, jadwal, dosen_all
+def load_sirama(path: Path) -> tuple[pd.DataFrame, pd.DataFrame]:
+    xl = open_excel(path)
+    # Course dan Jadwal dibaca dalam satu panggilan (usecols = gabungan kolom keduanya)
+    wanted = set(COURSE_COLS) | set(JADWAL_COLS)
+    sheets = pd.read_excel(xl, sheet_name=["Course", "Jadwal"], usecols=lambda c: c in wanted)
+    course = sheets["Course"]
+    # SKS kosong / bukan angka dianggap 0
+    course["SKS"] = pd.to_numeric(course["SKS"], errors="coerce").fillna(0).astype("int16")
+    jadwal = sheets["Jadwal"]
+    # Kolom kunci duplicated/groupby/sort -> category (hash pakai kode int)
+    key_cols = ["HARI", "SHIFT", "DOSEN", "RUANGAN", "KELAS"]
+    jadwal[key_cols] = jadwal[key_cols].astype("category")
+    # Ruangan dinormalisasi sekali; dipakai check_5, check_7 dan check_8
+    jadwal["RUANGAN_NORM"] = normalize_ruangan(jadwal["RUANGAN"]).astype("category")
+    # SHIFT cukup di-parse sekali; dipakai ulang oleh check_2 dan check_3
+    jadwal = jadwal.join(parse_shift_columns(jadwal["SHIFT"]))
+    return course, jadwal
 
 
 def load_ruang(path: Path) -> pd.DataFrame:
     """Load master ruangan dari file 030226 ruang kelas .xlsx (sheet 'ruang')."""
-    xl = pd.ExcelFile(path)
-    df = pd.read_excel(xl, sheet_name="ruang")
+    xl = open_excel(path)
+    df = pd.read_excel(xl, sheet_name="ruang", usecols=lambda c: c in ("nama_ruang", "tipe"))
     # Jika hanya butuh ruangan tipe KELAS, filter di sini
     if "tipe" in df.columns:
-        df = df[df["tipe"] == "KELAS"].copy()
+        df = df[df["tipe"] == "KELAS"]
     return df
 
 
@@ -127,46 +118,42 @@ def load_ruang(path: Path) -> pd.DataFrame:
 # -----------------------------------------------------------------------------
 def check_1_belum_jadwal(course: pd.DataFrame, jadwal: pd.DataFrame) -> pd.DataFrame:
     """Mata kuliah yang belum dijadwalkan (UID di Course tidak ada di Jadwal)."""
-    uid_jadwal = set(jadwal["UID"].dropna().astype(str))
-    mask = ~course["UID"].astype(str).isin(uid_jadwal)
-    out = course.loc[mask, ["UID", "MATA KULIAH", "KODE KULIAH", "KELAS", "DOSEN/TIM DOSEN", "PROGRAM STUDI"]].copy()
+    # UID bisa campuran angka/teks, jadi dibandingkan sebagai string
+    mask = ~course["UID"].astype(str).isin(jadwal["UID"].dropna().astype(str))
+    out = course.loc[mask, ["UID", "MATA KULIAH", "KODE KULIAH", "KELAS", "DOSEN/TIM DOSEN", "PROGRAM STUDI"]]
     out.insert(0, "NO", range(1, len(out) + 1))
     return out
 
 
 def check_2_tidak_match_sks(course: pd.DataFrame, jadwal: pd.DataFrame) -> pd.DataFrame:
     """Jadwal yang durasi jam tidak sama dengan SKS (1 SKS = 1 jam)."""
-    j = jadwal[["UID", "HARI", "SHIFT", "RUANGAN", "NAMA MATA KULIAH", "KELAS"]].copy()
-    j["DURASI_JAM"] = parse_shift_to_duration(jadwal["SHIFT"])
-    c = course[["UID", "SKS"]].copy()
-    merged = j.merge(c, on="UID", how="left")
-    merged["SKS"] = pd.to_numeric(merged["SKS"], errors="coerce").fillna(0).astype(int)
-    mask = merged["DURASI_JAM"].notna() & (merged["DURASI_JAM"] != merged["SKS"])
-    out = merged.loc[mask, ["UID", "NAMA MATA KULIAH", "KELAS", "SKS", "DURASI_JAM", "HARI", "SHIFT", "RUANGAN"]].copy()
-    out = out.rename(columns={"DURASI_JAM": "DURASI_JAM_AKTUAL"})
+    merged = jadwal[["UID", "HARI", "SHIFT", "RUANGAN", "NAMA MATA KULIAH", "KELAS", "_DUR_HR"]].merge(
+        course[["UID", "SKS"]], on="UID", how="left"
+    )
+    # UID yang tidak ada di Course dianggap SKS 0
+    merged["SKS"] = merged["SKS"].fillna(0).astype(int)
+    mask = merged["_DUR_HR"].notna() & (merged["_DUR_HR"] != merged["SKS"])
+    out = merged.loc[mask, ["UID", "NAMA MATA KULIAH", "KELAS", "SKS", "_DUR_HR", "HARI", "SHIFT", "RUANGAN"]]
+    out = out.rename(columns={"_DUR_HR": "DURASI_JAM_AKTUAL"})
     out.insert(0, "NO", range(1, len(out) + 1))
     return out
 
 
 def check_3_jadwal_maghrib(jadwal: pd.DataFrame) -> pd.DataFrame:
     """Jadwal yang overlap dengan waktu maghrib (17:30 - 19:30)."""
-    starts, ends = parse_shift_times(jadwal["SHIFT"])
-    mask = pd.Series(
-        [overlaps_maghrib(starts.iloc[i], ends.iloc[i]) for i in range(len(jadwal))],
-        index=jadwal.index,
-    )
-    out = jadwal.loc[mask, ["UID", "HARI", "SHIFT", "RUANGAN", "NAMA MATA KULIAH", "KELAS", "DOSEN"]].copy()
+    mask = (jadwal["_START_MIN"].lt(MAGHRIB_END_MIN) & jadwal["_END_MIN"].gt(MAGHRIB_START_MIN)).fillna(False).astype(bool)
+    out = jadwal.loc[mask, ["UID", "HARI", "SHIFT", "RUANGAN", "NAMA MATA KULIAH", "KELAS", "DOSEN"]]
     out.insert(0, "NO", range(1, len(out) + 1))
     return out
 
 
 def check_4_bentrok_dosen(jadwal: pd.DataFrame) -> pd.DataFrame:
     """Dosen yang double booking (HARI, SHIFT, DOSEN) muncul > 1 kali."""
-    g = jadwal.groupby(["HARI", "SHIFT", "DOSEN"], dropna=False)
-    bentrok = g.filter(lambda x: len(x) > 1)
+    mask = jadwal.duplicated(subset=["HARI", "SHIFT", "DOSEN"], keep=False)
+    bentrok = jadwal.loc[mask]
     if bentrok.empty:
         return pd.DataFrame(columns=["NO", "HARI", "SHIFT", "DOSEN", "UID", "NAMA MATA KULIAH", "KELAS", "RUANGAN"])
-    out = bentrok[["HARI", "SHIFT", "DOSEN", "UID", "NAMA MATA KULIAH", "KELAS", "RUANGAN"]].copy()
+    out = bentrok[["HARI", "SHIFT", "DOSEN", "UID", "NAMA MATA KULIAH", "KELAS", "RUANGAN"]]
     out = out.sort_values(["HARI", "SHIFT", "DOSEN"])
     out.insert(0, "NO", range(1, len(out) + 1))
     return out
@@ -174,13 +161,11 @@ def check_4_bentrok_dosen(jadwal: pd.DataFrame) -> pd.DataFrame:
 
 def check_5_bentrok_ruangan(jadwal: pd.DataFrame) -> pd.DataFrame:
     """Ruangan double booking (HARI, SHIFT, RUANGAN normalisasi) > 1."""
-    j = jadwal.copy()
-    j["RUANGAN_NORM"] = normalize_ruangan(j["RUANGAN"])
-    g = j.groupby(["HARI", "SHIFT", "RUANGAN_NORM"], dropna=False)
-    bentrok = g.filter(lambda x: len(x) > 1)
+    mask = jadwal.duplicated(subset=["HARI", "SHIFT", "RUANGAN_NORM"], keep=False)
+    bentrok = jadwal.loc[mask]
     if bentrok.empty:
         return pd.DataFrame(columns=["NO", "HARI", "SHIFT", "RUANGAN", "UID", "NAMA MATA KULIAH", "KELAS", "DOSEN"])
-    out = bentrok[["HARI", "SHIFT", "RUANGAN", "UID", "NAMA MATA KULIAH", "KELAS", "DOSEN"]].copy()
+    out = bentrok[["HARI", "SHIFT", "RUANGAN", "UID", "NAMA MATA KULIAH", "KELAS", "DOSEN"]]
     out = out.sort_values(["HARI", "SHIFT", "RUANGAN"])
     out.insert(0, "NO", range(1, len(out) + 1))
     return out
@@ -188,13 +173,12 @@ def check_5_bentrok_ruangan(jadwal: pd.DataFrame) -> pd.DataFrame:
 
 def check_6_bentrok_angkatan(jadwal: pd.DataFrame) -> pd.DataFrame:
     """Satu angkatan (IT-06, DB-04, ...) dapat 2+ kelas di (HARI, SHIFT) yang sama."""
-    j = jadwal.copy()
-    j["ANGKATAN"] = j["KELAS"].apply(extract_angkatan)
-    g = j.groupby(["HARI", "SHIFT", "ANGKATAN"], dropna=False)
-    bentrok = g.filter(lambda x: len(x) > 1)
+    j = jadwal.assign(ANGKATAN=extract_angkatan_series(jadwal["KELAS"]).astype("category"))
+    mask = j.duplicated(subset=["HARI", "SHIFT", "ANGKATAN"], keep=False)
+    bentrok = j.loc[mask]
     if bentrok.empty:
         return pd.DataFrame(columns=["NO", "HARI", "SHIFT", "ANGKATAN", "UID", "NAMA MATA KULIAH", "KELAS", "DOSEN"])
-    out = bentrok[["HARI", "SHIFT", "ANGKATAN", "UID", "NAMA MATA KULIAH", "KELAS", "DOSEN"]].copy()
+    out = bentrok[["HARI", "SHIFT", "ANGKATAN", "UID", "NAMA MATA KULIAH", "KELAS", "DOSEN"]]
     out = out.sort_values(["HARI", "SHIFT", "ANGKATAN"])
     out.insert(0, "NO", range(1, len(out) + 1))
     return out
@@ -205,29 +189,25 @@ def check_7_ruangan_kosong(jadwal: pd.DataFrame, ruang: pd.DataFrame) -> pd.Data
     Per slot (HARI, SHIFT): ruangan master yang tidak dipakai di slot itu.
     Master ruangan diambil dari 030226 ruang kelas .xlsx.
     """
-    j = jadwal.copy()
-    j["RUANGAN_NORM"] = normalize_ruangan(j["RUANGAN"])
+    ruang_master = sorted(set(normalize_ruangan(ruang["nama_ruang"]).dropna().unique()))
 
-    ruang_master = set(normalize_ruangan(ruang["nama_ruang"]).dropna().unique())
+    # Semua kombinasi slot x ruangan master, lalu buang yang terpakai di slot itu
+    slot_cols = ["HARI", "SHIFT"]
+    kandidat = jadwal[slot_cols].drop_duplicates().merge(
+        pd.DataFrame({"RUANGAN_NORM": ruang_master}), how="cross"
+    )
+    terpakai = jadwal[slot_cols + ["RUANGAN_NORM"]].dropna(subset=["RUANGAN_NORM"]).drop_duplicates()
+    kosong = kandidat.merge(terpakai, how="left", indicator=True)
+    kosong = kosong[kosong["_merge"] == "left_only"]
 
-    rows: list[dict] = []
-    for (hari, shift), grp in j.groupby(["HARI", "SHIFT"], dropna=False):
-        terpakai = set(grp["RUANGAN_NORM"].dropna().unique())
-        kosong = sorted(ruang_master - terpakai)
-        if kosong:
-            rows.append(
-                {
-                    "HARI": hari,
-                    "SHIFT": shift,
-                    "RUANGAN_KOSONG": ", ".join(kosong),
-                    "JUMLAH": len(kosong),
-                }
-            )
-
-    if not rows:
+    if kosong.empty:
         return pd.DataFrame(columns=["NO", "HARI", "SHIFT", "RUANGAN_KOSONG", "JUMLAH"])
 
-    out = pd.DataFrame(rows).sort_values(["HARI", "SHIFT"])
+    out = (
+        kosong.groupby(slot_cols, dropna=False, observed=True)["RUANGAN_NORM"]
+        .agg(RUANGAN_KOSONG=", ".join, JUMLAH="size")
+        .reset_index()
+    )
     out.insert(0, "NO", range(1, len(out) + 1))
     return out
 
@@ -237,20 +217,17 @@ def check_8_ruangan_tidak_terdaftar(jadwal: pd.DataFrame, ruang: pd.DataFrame) -
     Ruangan yang muncul di Jadwal tetapi tidak ada di master ruangan.
     Berguna untuk deteksi typo / ruangan belum terdaftar.
     """
-    j = jadwal.copy()
-    j["RUANGAN_NORM"] = normalize_ruangan(j["RUANGAN"])
-
     ruang_master = set(normalize_ruangan(ruang["nama_ruang"]).dropna().unique())
-    mask = ~j["RUANGAN_NORM"].isin(ruang_master)
+    mask = ~jadwal["RUANGAN_NORM"].isin(ruang_master)
 
     if not mask.any():
         return pd.DataFrame(
             columns=["NO", "HARI", "SHIFT", "RUANGAN", "UID", "NAMA MATA KULIAH", "KELAS", "DOSEN"]
         )
 
-    out = j.loc[
+    out = jadwal.loc[
         mask, ["HARI", "SHIFT", "RUANGAN", "UID", "NAMA MATA KULIAH", "KELAS", "DOSEN"]
-    ].copy()
+    ]
     out = out.sort_values(["HARI", "SHIFT", "RUANGAN"])
     out.insert(0, "NO", range(1, len(out) + 1))
     return out
@@ -271,6 +248,11 @@ def build_summary(results: dict[str, pd.DataFrame]) -> pd.DataFrame:
     return pd.DataFrame(rows)
 
 
+def excel_writer_engine() -> str:
+    """xlsxwriter (jauh lebih cepat untuk menulis) jika terpasang, fallback ke openpyxl."""
+    return "xlsxwriter" if find_spec("xlsxwriter") is not None else "openpyxl"
+
+
 # -----------------------------------------------------------------------------
 # Main
 # -----------------------------------------------------------------------------
@@ -280,7 +262,7 @@ def main() -> None:
         return
 
     print("Memuat data SIRAMA...")
-    course, jadwal, dosen_all = load_sirama(EXCEL_PATH)
+    course, jadwal = load_sirama(EXCEL_PATH)
 
     if not RUANG_PATH.exists():
         print(f"File ruang tidak ditemukan: {RUANG_PATH}")
@@ -290,21 +272,25 @@ def main() -> None:
     ruang = load_ruang(RUANG_PATH)
 
     print("Menjalankan 7 croscheck + cek ruangan...")
-    results = {
-        "1_belum_jadwal": check_1_belum_jadwal(course, jadwal),
-        "2_tidak_match_sks": check_2_tidak_match_sks(course, jadwal),
-        "3_jadwal_maghrib": check_3_jadwal_maghrib(jadwal),
-        "4_bentrok_dosen": check_4_bentrok_dosen(jadwal),
-        "5_bentrok_ruangan": check_5_bentrok_ruangan(jadwal),
-        "6_bentrok_angkatan": check_6_bentrok_angkatan(jadwal),
-        "7_ruangan_kosong": check_7_ruangan_kosong(jadwal, ruang),
-        "8_ruangan_tidak_terdaftar": check_8_ruangan_tidak_terdaftar(jadwal, ruang),
+    checks = {
+        "1_belum_jadwal": (check_1_belum_jadwal, course, jadwal),
+        "2_tidak_match_sks": (check_2_tidak_match_sks, course, jadwal),
+        "3_jadwal_maghrib": (check_3_jadwal_maghrib, jadwal),
+        "4_bentrok_dosen": (check_4_bentrok_dosen, jadwal),
+        "5_bentrok_ruangan": (check_5_bentrok_ruangan, jadwal),
+        "6_bentrok_angkatan": (check_6_bentrok_angkatan, jadwal),
+        "7_ruangan_kosong": (check_7_ruangan_kosong, jadwal, ruang),
+        "8_ruangan_tidak_terdaftar": (check_8_ruangan_tidak_terdaftar, jadwal, ruang),
     }
+    # Semua cek hanya membaca course/jadwal/ruang (tidak mengubahnya), jadi aman paralel
+    with ThreadPoolExecutor(max_workers=len(checks)) as ex:
+        futures = {name: ex.submit(fn, *args) for name, (fn, *args) in checks.items()}
+        results = {name: fut.result() for name, fut in futures.items()}
 
     summary = build_summary(results)
 
     print(f"Menulis hasil ke {OUTPUT_PATH}...")
-    with pd.ExcelWriter(OUTPUT_PATH, engine="openpyxl") as writer:
+    with pd.ExcelWriter(OUTPUT_PATH, engine=excel_writer_engine()) as writer:
         summary.to_excel(writer, sheet_name="0_ringkasan", index=False)
         for name, df in results.items():
             df.to_excel(writer, sheet_name=name, index=False)
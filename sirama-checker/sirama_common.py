@@ -0,0 +1,44 @@
+"""
+Helper bersama untuk script sirama-checker (main.py dan breakdown_shift_kelas*.py):
+versi pandas, parse SHIFT vektor, dan pembuka workbook.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+
+PANDAS_VERSION = tuple(int(x) for x in pd.__version__.split(".")[:2])
+
+# SHIFT "HH:MM[:SS] - HH:MM[:SS]" (spasi sudah dibuang)
+SHIFT_PATTERN = r"^\s*(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?\s*-\s*(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?\s*$"
+
+
+def extract_shift(shift_series: pd.Series) -> pd.DataFrame:
+    """SHIFT (e.g. '13:30:00 - 16:30:00') -> kolom h1, m1, s1, h2, m2, s2 (Int32, <NA> jika tidak valid).
+
+    Detik yang tidak ditulis (format HH:MM) diisi 0.
+    """
+    parts = (
+        shift_series.astype("string")
+        .str.replace(" ", "", regex=False)
+        .str.extract(SHIFT_PATTERN)
+    )
+    parts.columns = ["h1", "m1", "s1", "h2", "m2", "s2"]
+    num = parts.apply(pd.to_numeric, errors="coerce").astype("Int32")
+    # Start dan end harus format sama (HH:MM:SS atau HH:MM) dan dalam rentang jam yang valid
+    valid = (
+        (parts["s1"].isna() == parts["s2"].isna())
+        & num[["h1", "h2"]].le(23).all(axis=1)
+        & num[["m1", "m2"]].le(59).all(axis=1)
+        & num[["s1", "s2"]].fillna(0).le(59).all(axis=1)
+    )
+    return num.fillna({"s1": 0, "s2": 0}).where(valid)
+
+
+def open_excel(path: Path) -> pd.ExcelFile:
+    """Buka workbook pakai engine calamine (jauh lebih cepat) jika terpasang, fallback ke default."""
+    try:
+        return pd.ExcelFile(path, engine="calamine")
+    except (ImportError, ValueError):
+        return pd.ExcelFile(path)
@@ -1,7 +1,8 @@
 import csv
 import random
-from datetime import datetime, timedelta, time
-from collections import defaultdict
+from datetime import date, datetime, timedelta, time
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
 
 try:
@@ -19,23 +20,29 @@ SHIFT_DURATION_MIN = 120
 BLACKLIST_MON_WED_SUFFIXES = {"KTT 2.08", "KTT 2.07", "KTT 2.06", "KTT 2.05", "KTT 2.04"}
 BLACKLIST_MON_FRI_SUFFIXES = {"KTT 2.09"}
 
+# Buffer baca/tulis CSV (default Python 8 KiB); csv.reader/writer jadi lebih sedikit syscall
+CSV_BUFFER_SIZE = 1 << 18
+
+DATE_FORMATS = ("%d-%b-%y", "%d/%m/%Y", "%d-%m-%Y")
+LAST_DATE_FORMAT = [DATE_FORMATS[0]]
+
 ALL_ROOMS = []
 
 def is_within_uts_week(date_dt: datetime) -> bool:
     return START_DATE.date() <= date_dt.date() <= END_DATE.date()
 
+@lru_cache(maxsize=None)
+def is_room_blacklisted_on_weekday(room: str, weekday: int) -> bool:
+    """Cek blacklist per (ruangan, weekday); hasilnya di-cache."""
+    if weekday <= 4 and room.endswith(tuple(BLACKLIST_MON_FRI_SUFFIXES)):
+        return True
+    return weekday <= 2 and room.endswith(tuple(BLACKLIST_MON_WED_SUFFIXES))
+
 def is_room_blacklisted_on_date(room: str, date_dt: datetime) -> bool:
     """Return True jika ruangan diblacklist pada tanggal tersebut."""
     if not is_within_uts_week(date_dt):
         return False
-    weekday = date_dt.weekday()
-    for suf in BLACKLIST_MON_FRI_SUFFIXES:
-        if room.endswith(suf) and weekday <= 4:
-            return True
-    for suf in BLACKLIST_MON_WED_SUFFIXES:
-        if room.endswith(suf) and weekday <= 2:
-            return True
-    return False
+    return is_room_blacklisted_on_weekday(room, date_dt.weekday())
 
 def load_rooms_from_csv(rooms_csv_path: Path) -> list[str]:
     rooms = []
@@ -52,17 +59,22 @@ def load_rooms_from_csv(rooms_csv_path: Path) -> list[str]:
         print(f"Error loading rooms: {e}")
     return rooms
 
-def parse_existing_datetime(hari: str, tanggal: str, shift: str) -> tuple[datetime, datetime] | None:
+@lru_cache(maxsize=None)
+def parse_existing_datetime(tanggal: str, shift: str) -> tuple[datetime, datetime] | None:
+    """Parse TANGGAL + SHIFT (hasil di-cache: kombinasi unik di CSV sedikit)."""
     if not tanggal or not shift:
         return None
-    date_formats = ["%d-%b-%y", "%d/%m/%Y", "%d-%m-%Y"]
+    tanggal = tanggal.strip()
     date_dt = None
-    for fmt in date_formats:
+    # Format yang terakhir berhasil dicoba dulu (satu CSV biasanya satu format tanggal)
+    last_fmt = LAST_DATE_FORMAT[0]
+    for fmt in (last_fmt, *(f for f in DATE_FORMATS if f != last_fmt)):
         try:
-            date_dt = datetime.strptime(tanggal.strip(), fmt)
-            break
-        except Exception:
+            date_dt = datetime.strptime(tanggal, fmt)
+        except ValueError:
             continue
+        LAST_DATE_FORMAT[0] = fmt
+        break
     if date_dt is None:
         return None
     parts = shift.split("-")
@@ -79,9 +91,18 @@ def parse_existing_datetime(hari: str, tanggal: str, shift: str) -> tuple[dateti
     end_dt = datetime.combine(date_dt.date(), time(h2, m2))
     return start_dt, end_dt
 
+def slot_key(start_dt: datetime, end_dt: datetime) -> int:
+    """(mulai, selesai) -> int menit-dalam-hari, key slot internal pengganti string 'HH.MM - HH.MM'."""
+    return (start_dt.hour * 60 + start_dt.minute) * 1440 + end_dt.hour * 60 + end_dt.minute
+
+@lru_cache(maxsize=None)
 def format_time_range(start_dt: datetime, end_dt: datetime) -> str:
     return f"{start_dt:%H.%M} - {end_dt:%H.%M}"
 
+def day_key(d: date) -> int:
+    """date -> nomor hari (ordinal) sebagai key pemakaian; int, bukan string 'YYYY-MM-DD'."""
+    return d.toordinal()
+
 def weekday_name(dt: datetime) -> str:
     mapping = {
         0: "SENIN",
@@ -109,37 +130,134 @@ def iter_allowed_dates():
             yield cur
         cur += timedelta(days=1)
 
-def pick_free_room(date_dt: datetime, date_key: str, shift_key: str, start_dt: datetime, end_dt: datetime, 
-                   room_usage: dict, allow_aula: bool = False, bentuk_ujian: str = "", jumlah_mhs: int = 0) -> str | None:
-    used_counts = room_usage.get(date_key, {}).get(shift_key, {})
-    normal_candidates = []
-    aula_candidates = []
-    
-    for r in ALL_ROOMS:
-        if is_room_blacklisted_on_date(r, date_dt):
-            continue
-        
-        used_count = used_counts.get(r, 0)
-        
-        if r.strip().upper() == "AULA":
-            if not allow_aula:
-                continue
-            bentuk = (bentuk_ujian or "").strip().lower()
-            if bentuk != "ujian tulis" or jumlah_mhs <= 0 or jumlah_mhs < 40:
-                continue
-            if used_count < 2:
-                aula_candidates.append(r)
-        else:
-            if used_count == 0:
-                normal_candidates.append(r)
+# Tabel per tanggal minggu UTS (dibangun sekali): slot shift, nama hari, label TANGGAL, tanggal ISO (untuk log).
+# Hanya tanggal di minggu UTS yang bisa kena blacklist, jadi semua slot pengganti ada di sini.
+UTS_DAYS = [START_DATE + timedelta(days=i) for i in range((END_DATE.date() - START_DATE.date()).days + 1)]
+ALLOWED_DAYS = list(iter_allowed_dates())
+SHIFTS_BY_DATE = {d.date(): tuple(generate_daily_shifts(d)) for d in UTS_DAYS}
+WEEKDAY_NAME_BY_DATE = {d.date(): weekday_name(d) for d in UTS_DAYS}
+DATE_LABEL_BY_DATE = {d.date(): d.strftime("%d-%b-%y") for d in UTS_DAYS}
+DATE_ISO_BY_DATE = {d.date(): d.strftime("%Y-%m-%d") for d in UTS_DAYS}
+
+def is_aula(room: str) -> bool:
+    return room.strip().upper() == "AULA"
+
+@lru_cache(maxsize=None)
+def allowed_rooms_on(d: date) -> tuple[tuple[str, ...], tuple[str, ...]]:
+    """(ruangan normal, ruangan AULA) yang tidak diblacklist pada tanggal d, urut ALL_ROOMS."""
+    day_dt = datetime.combine(d, time())
+    allowed = [r for r in ALL_ROOMS if not is_room_blacklisted_on_date(r, day_dt)]
+    return tuple(r for r in allowed if not is_aula(r)), tuple(r for r in allowed if is_aula(r))
+
+def choose_unused(rooms: tuple[str, ...], used) -> str | None:
+    """Pilih acak (uniform) satu ruangan yang tidak ada di used tanpa membangun list kandidat.
+
+    Satu kali randrange atas jumlah kandidat, sama seperti random.choice pada list kandidat.
+    """
+    if not used:
+        return random.choice(rooms) if rooms else None
+    n_free = sum(1 for r in rooms if r not in used)
+    if not n_free:
+        return None
+    k = random.randrange(n_free)
+    return next(islice((r for r in rooms if r not in used), k, None))
+
+def pick_free_room(date_dt: datetime, date_key: int, shift_key: int, start_dt: datetime, end_dt: datetime, 
+                   used_normal: dict, aula_count: dict, allow_aula: bool = False, bentuk_ujian: str = "", jumlah_mhs: int = 0) -> str | None:
+    key = (date_key, shift_key)
+    normal_rooms, aula_rooms = allowed_rooms_on(date_dt.date())
+    used = used_normal.get(key, ())
     
     # Prioritize normal rooms first, then AULA if allowed
-    if normal_candidates:
-        return random.choice(normal_candidates)
-    if aula_candidates:
-        return random.choice(aula_candidates)
+    room = choose_unused(normal_rooms, used)
+    if room is not None:
+        return room
+    if not allow_aula or not aula_rooms:
+        return None
+    bentuk = (bentuk_ujian or "").strip().lower()
+    if bentuk != "ujian tulis" or jumlah_mhs <= 0 or jumlah_mhs < 40:
+        return None
+    # AULA boleh dipakai 2 ujian per slot
+    if aula_count.get(key, 0) < 2:
+        return random.choice(aula_rooms)
     return None
 
+def excel_layout(df) -> tuple[list[int], object]:
+    """Lebar kolom Excel (10..60) + matriks panjang teks tiap sel, dihitung sekali untuk semua engine."""
+    # Semua sel sudah string (dibaca dari CSV), jadi .str.len() langsung tanpa astype(str)
+    lengths = df.apply(lambda col: col.str.len()).to_numpy(dtype="int64")
+    max_lens = lengths.max(axis=0, initial=0) if len(df.columns) else []
+    col_widths = [
+        max(10, min(60, max(len(col_name), int(n)) + 2))
+        for col_name, n in zip(df.columns, max_lens)
+    ]
+    return col_widths, lengths
+
+def estimate_row_heights(lengths, chars_per_line: list[int]) -> list[tuple[int, int]]:
+    """(posisi baris data, tinggi) untuk baris yang butuh lebih dari 1 baris teks (15 point per baris, maks 60).
+
+    Baris 1 baris teks tidak dikembalikan: tinggi default Excel sudah 15.
+    """
+    # ceil(panjang / chars_per_line), minimal 1 baris
+    max_lines = (-(-lengths // chars_per_line)).max(axis=1, initial=1)
+    return [(int(i), min(60, int(max_lines[i]) * 15)) for i in (max_lines > 1).nonzero()[0]]
+
+def _format_xlsxwriter(writer, header: list[str], col_widths: list[int], lengths) -> None:
+    workbook = writer.book
+    worksheet = writer.sheets["Sheet1"]
+    # Autofilter pada header + freeze header baris pertama
+    worksheet.autofilter(0, 0, len(lengths), len(header) - 1)
+    worksheet.freeze_panes(1, 0)
+    # Format header: bold
+    header_format = workbook.add_format({"bold": True, "bg_color": "#D3D3D3"})
+    for col_num, col_name in enumerate(header):
+        worksheet.write(0, col_num, col_name, header_format)
+    # Auto-resize kolom dan set wrap text
+    wrap_format = workbook.add_format({"text_wrap": True, "valign": "top"})
+    for c, width in enumerate(col_widths):
+        worksheet.set_column(c, c, width, wrap_format)
+    # Auto-adjust row height, estimasi: sekitar 8 karakter per unit lebar kolom
+    chars_per_line = [max(8, int(width * 8)) for width in col_widths]
+    for pos, row_height in estimate_row_heights(lengths, chars_per_line):
+        worksheet.set_row(pos + 1, row_height)
+
+def _format_openpyxl(writer, header: list[str], col_widths: list[int], lengths) -> None:
+    from openpyxl.styles import Alignment, Font, PatternFill  # type: ignore
+    from openpyxl.utils import get_column_letter  # type: ignore
+
+    ws = writer.book["Sheet1"]
+    # Auto filter untuk seluruh area data + freeze header baris pertama
+    ws.auto_filter.ref = ws.dimensions
+    ws.freeze_panes = "A2"
+    # Format header: bold dan background abu-abu
+    header_fill = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
+    header_font = Font(bold=True)
+    for cell in ws[1]:
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+    # Auto-resize kolom dan set wrap text
+    wrap_alignment = Alignment(wrap_text=True, vertical="top")
+    for idx, width in enumerate(col_widths, start=1):
+        ws.column_dimensions[get_column_letter(idx)].width = width
+    # Set wrap text untuk semua cell data (mulai baris 2, skip header) dalam satu sweep
+    for row in ws.iter_rows(min_row=2, max_row=len(lengths) + 1, max_col=len(col_widths)):
+        for cell in row:
+            cell.alignment = wrap_alignment
+    # Auto-adjust row height, estimasi: sekitar 7 karakter per unit lebar kolom
+    chars_per_line = [max(7, int(width * 7)) for width in col_widths]
+    for pos, row_height in estimate_row_heights(lengths, chars_per_line):
+        ws.row_dimensions[pos + 2].height = row_height
+
+EXCEL_FORMATTERS = {"xlsxwriter": _format_xlsxwriter, "openpyxl": _format_openpyxl}
+
+def write_formatted_excel(path: Path, df, engine: str, layout) -> None:
+    """Tulis df ke Excel (filter, freeze, header, lebar kolom, tinggi baris) dengan engine tertentu."""
+    col_widths, lengths = layout
+    with pd.ExcelWriter(path, engine=engine) as writer:  # type: ignore
+        df.to_excel(writer, index=False, sheet_name="Sheet1")
+        EXCEL_FORMATTERS[engine](writer, list(df.columns), col_widths, lengths)
+
 def main():
     base = Path(__file__).parent
     input_csv = base / "jadwal-uts-fix.csv"
@@ -148,65 +266,94 @@ def main():
     # Load rooms
     global ALL_ROOMS
     ALL_ROOMS = load_rooms_from_csv(rooms_csv)
+    allowed_rooms_on.cache_clear()
     print(f"Loaded {len(ALL_ROOMS)} rooms")
     
     # Read all rows from CSV
-    rows = []
-    with input_csv.open("r", encoding="utf-8-sig", newline="") as f:
+    with input_csv.open("r", encoding="utf-8-sig", newline="", buffering=CSV_BUFFER_SIZE) as f:
         reader = csv.reader(f, delimiter=";")
         header = next(reader)
-        rows = list(reader)
+        # Pad setiap row sekali ke jumlah kolom header, jadi penulisan kolom cukup row[i] = ...
+        n_cols = len(header)
+        rows = [row + [""] * (n_cols - len(row)) if len(row) < n_cols else row for row in reader]
     
     # Build column index - header first column is PROGRAM STUDI, not HARI
     col_idx = {name.strip().upper(): i for i, name in enumerate(header)}
     print(f"CSV columns: {list(col_idx.keys())}")
     
-    def get(row, key, default=""):
-        i = col_idx.get(key, None)
-        if i is None or i >= len(row):
-            return default
-        return row[i].strip()
+    # Index kolom dicari sekali (konstan untuk semua baris)
+    hari_col = col_idx.get("HARI")
+    tanggal_col = col_idx.get("TANGGAL")
+    shift_col = col_idx.get("SHIFT")
+    ruangan_col = col_idx.get("RUANGAN")
+    kelas_col = col_idx.get("KELAS")
+    bentuk_col = col_idx.get("BENTUK UJIAN")
+    jumlah_col = col_idx.get("JUMLAH MAHASISWA")
+    
+    def field(row, i):
+        # rows sudah di-pad ke jumlah kolom header, jadi cukup cek kolomnya ada
+        return row[i].strip() if i is not None else ""
     
     # Build usage map from all non-blacklisted entries
-    room_usage = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
-    class_usage = defaultdict(list)
-    class_daily_count = defaultdict(lambda: defaultdict(int))
+    # Per (date_key, shift_key), keduanya int (lihat day_key/slot_key): set ruangan normal yang terpakai + jumlah pemakaian AULA
+    used_normal: dict[tuple[int, int], set[str]] = {}
+    aula_count: dict[tuple[int, int], int] = {}
+    # Per (kelas, date_key): interval ujian kelas itu pada tanggal tsb (len = jumlah ujian hari itu)
+    class_usage: dict[tuple[str, int], list[tuple[datetime, datetime]]] = {}
     
     blacklisted_indices = []
     
+    def add_room_usage(date_key: int, shift_key: int, room: str) -> None:
+        key = (date_key, shift_key)
+        if is_aula(room):
+            aula_count[key] = aula_count.get(key, 0) + 1
+        else:
+            used = used_normal.get(key)
+            if used is None:
+                used_normal[key] = {room}
+            else:
+                used.add(room)
+    
+    def add_class_usage(kelas: str, date_key: int, start_dt: datetime, end_dt: datetime) -> None:
+        key = (kelas, date_key)
+        slots = class_usage.get(key)
+        if slots is None:
+            class_usage[key] = [(start_dt, end_dt)]
+        else:
+            slots.append((start_dt, end_dt))
+    
     # First pass: identify blacklisted entries and build usage map from others
     for idx, row in enumerate(rows):
         if not any(row):
             continue
         
-        hari = get(row, "HARI")
-        tanggal = get(row, "TANGGAL")
-        shift = get(row, "SHIFT")
-        ruangan = get(row, "RUANGAN")
-        kelas = get(row, "KELAS")
+        hari = field(row, hari_col)
+        tanggal = field(row, tanggal_col)
+        shift = field(row, shift_col)
+        ruangan = field(row, ruangan_col)
+        kelas = field(row, kelas_col)
         
         if not hari or not tanggal or not shift or not ruangan:
             # Empty entries - still add to usage if they have valid time/room
             if hari and tanggal and shift and ruangan:
-                parsed = parse_existing_datetime(hari, tanggal, shift)
+                parsed = parse_existing_datetime(tanggal, shift)
                 if parsed:
                     start_dt, end_dt = parsed
-                    date_key = start_dt.strftime("%Y-%m-%d")
-                    shift_key = format_time_range(start_dt, end_dt)
+                    date_key = day_key(start_dt.date())
+                    shift_key = slot_key(start_dt, end_dt)
                     if not is_room_blacklisted_on_date(ruangan, start_dt):
-                        room_usage[date_key][shift_key][ruangan] += 1
+                        add_room_usage(date_key, shift_key, ruangan)
                         if kelas:
-                            class_usage[kelas].append((start_dt, end_dt))
-                            class_daily_count[kelas][date_key] += 1
+                            add_class_usage(kelas, date_key, start_dt, end_dt)
             continue
         
-        parsed = parse_existing_datetime(hari, tanggal, shift)
+        parsed = parse_existing_datetime(tanggal, shift)
         if parsed is None:
             continue
         
         start_dt, end_dt = parsed
-        date_key = start_dt.strftime("%Y-%m-%d")
-        shift_key = format_time_range(start_dt, end_dt)
+        date_key = day_key(start_dt.date())
+        shift_key = slot_key(start_dt, end_dt)
         
         # Check if this room is blacklisted on this date
         if is_room_blacklisted_on_date(ruangan, start_dt):
@@ -214,10 +361,9 @@ def main():
             continue
         
         # Add to usage map (this entry is valid)
-        room_usage[date_key][shift_key][ruangan] += 1
+        add_room_usage(date_key, shift_key, ruangan)
         if kelas:
-            class_usage[kelas].append((start_dt, end_dt))
-            class_daily_count[kelas][date_key] += 1
+            add_class_usage(kelas, date_key, start_dt, end_dt)
     
     print(f"Found {len(blacklisted_indices)} entries with blacklisted rooms")
     if not blacklisted_indices:
@@ -228,140 +374,111 @@ def main():
     def is_class_conflict(kelas: str, start_dt: datetime, end_dt: datetime) -> bool:
         if not kelas:
             return False
-        for s, e in class_usage.get(kelas, []):
+        # Cukup cek tanggal yang sama; >= 2 ujian di hari itu sudah pasti konflik
+        same_day = class_usage.get((kelas, day_key(start_dt.date())), ())
+        if len(same_day) >= 2:
+            return True
+        for s, e in same_day:
             if not (end_dt <= s or start_dt >= e):
                 return True
-        date_key = start_dt.strftime("%Y-%m-%d")
-        if class_daily_count[kelas][date_key] >= 2:
-            return True
         return False
     
+    def move_row_to_slot(row: list[str], kelas: str, s_start: datetime, s_end: datetime,
+                         date_key_new: int, shift_key_new: int, new_room: str) -> None:
+        """Tulis hari/tanggal/shift/ruangan baru ke row lalu catat pemakaiannya."""
+        if hari_col is not None:
+            row[hari_col] = WEEKDAY_NAME_BY_DATE[s_start.date()]
+        if tanggal_col is not None:
+            row[tanggal_col] = DATE_LABEL_BY_DATE[s_start.date()]
+        if shift_col is not None:
+            row[shift_col] = format_time_range(s_start, s_end)
+        if ruangan_col is not None:
+            row[ruangan_col] = new_room
+        add_room_usage(date_key_new, shift_key_new, new_room)
+        if kelas:
+            add_class_usage(kelas, date_key_new, s_start, s_end)
+    
+    def jumlah_mhs_of(row) -> int:
+        jumlah_mhs_str = field(row, jumlah_col)
+        try:
+            return int(jumlah_mhs_str) if jumlah_mhs_str else 0
+        except:
+            return 0
+    
+    # Kelas besar (paling sulit dapat ruangan, butuh AULA) diproses dulu selagi ruangan masih banyak;
+    # sort stabil, jadi urutan CSV tetap untuk jumlah mahasiswa yang sama
+    ordered_indices = sorted(blacklisted_indices, key=lambda i: -jumlah_mhs_of(rows[i]))
+    
     fixed_count = 0
     if blacklisted_indices:
-        for idx in blacklisted_indices:
+        for idx in ordered_indices:
             row = rows[idx]
-            hari = get(row, "HARI")
-            tanggal = get(row, "TANGGAL")
-            shift = get(row, "SHIFT")
-            kelas = get(row, "KELAS")
-            bentuk_ujian = get(row, "BENTUK UJIAN")
-            jumlah_mhs_str = get(row, "JUMLAH MAHASISWA")
-            
-            try:
-                jumlah_mhs = int(jumlah_mhs_str) if jumlah_mhs_str else 0
-            except:
-                jumlah_mhs = 0
+            hari = field(row, hari_col)
+            tanggal = field(row, tanggal_col)
+            shift = field(row, shift_col)
+            kelas = field(row, kelas_col)
+            bentuk_ujian = field(row, bentuk_col)
+            jumlah_mhs = jumlah_mhs_of(row)
             
-            parsed = parse_existing_datetime(hari, tanggal, shift)
+            parsed = parse_existing_datetime(tanggal, shift)
             if parsed is None:
                 print(f"Warning: Could not parse datetime for row {idx+1}")
                 continue
             
             start_dt, end_dt = parsed
-            date_key = start_dt.strftime("%Y-%m-%d")
-            shift_key = format_time_range(start_dt, end_dt)
+            date_key = day_key(start_dt.date())
+            shift_key = slot_key(start_dt, end_dt)
             
             # Try to find a new room for the same time slot first
             new_room = None
             allow_aula = (bentuk_ujian.strip().lower() == "ujian tulis" and jumlah_mhs >= 40)
             new_room = pick_free_room(start_dt, date_key, shift_key, start_dt, end_dt, 
-                                     room_usage, allow_aula, bentuk_ujian, jumlah_mhs)
+                                     used_normal, aula_count, allow_aula, bentuk_ujian, jumlah_mhs)
             
             found_new_slot = False
             
             # If found room at same time, just update the room
             if new_room:
-                ruangan_col = col_idx.get("RUANGAN")
                 if ruangan_col is not None:
-                    while len(row) <= ruangan_col:
-                        row.append("")
                     row[ruangan_col] = new_room
-                    room_usage[date_key][shift_key][new_room] += 1
+                    add_room_usage(date_key, shift_key, new_room)
                     if kelas:
-                        class_usage[kelas].append((start_dt, end_dt))
-                        class_daily_count[kelas][date_key] += 1
+                        add_class_usage(kelas, date_key, start_dt, end_dt)
                     fixed_count += 1
                     found_new_slot = True
                     print(f"Fixed row {idx+1}: Same time, new room {new_room}")
             
             # If no room found at same time, try different times on same date
             if not found_new_slot:
-                for s_start, s_end in generate_daily_shifts(start_dt):
+                for s_start, s_end in SHIFTS_BY_DATE[start_dt.date()]:
                     if is_class_conflict(kelas, s_start, s_end):
                         continue
-                    date_key_new = s_start.strftime("%Y-%m-%d")
-                    shift_key_new = format_time_range(s_start, s_end)
+                    date_key_new = day_key(s_start.date())
+                    shift_key_new = slot_key(s_start, s_end)
                     new_room = pick_free_room(s_start, date_key_new, shift_key_new, s_start, s_end,
-                                             room_usage, allow_aula, bentuk_ujian, jumlah_mhs)
+                                             used_normal, aula_count, allow_aula, bentuk_ujian, jumlah_mhs)
                     if new_room:
-                        # Update row with new time and room
-                        hari_col = col_idx.get("HARI")
-                        tanggal_col = col_idx.get("TANGGAL")
-                        shift_col = col_idx.get("SHIFT")
-                        ruangan_col = col_idx.get("RUANGAN")
-                        
-                        # Ensure row has enough columns
-                        max_col = max([c for c in [hari_col, tanggal_col, shift_col, ruangan_col] if c is not None])
-                        while len(row) <= max_col:
-                            row.append("")
-                        
-                        if hari_col is not None:
-                            row[hari_col] = weekday_name(s_start)
-                        if tanggal_col is not None:
-                            row[tanggal_col] = s_start.strftime("%d-%b-%y")
-                        if shift_col is not None:
-                            row[shift_col] = shift_key_new
-                        if ruangan_col is not None:
-                            row[ruangan_col] = new_room
-                        
-                        # Update usage maps
-                        room_usage[date_key_new][shift_key_new][new_room] += 1
-                        if kelas:
-                            class_usage[kelas].append((s_start, s_end))
-                            class_daily_count[kelas][date_key_new] += 1
-                        
+                        move_row_to_slot(row, kelas, s_start, s_end, date_key_new, shift_key_new, new_room)
                         fixed_count += 1
                         found_new_slot = True
-                        print(f"Fixed row {idx+1}: New time {shift_key_new}, new room {new_room}")
+                        print(f"Fixed row {idx+1}: New time {format_time_range(s_start, s_end)}, new room {new_room}")
                         break
             
             # If still no room, try different dates
             if not found_new_slot:
-                for day_dt in iter_allowed_dates():
-                    for s_start, s_end in generate_daily_shifts(day_dt):
+                for day_dt in ALLOWED_DAYS:
+                    for s_start, s_end in SHIFTS_BY_DATE[day_dt.date()]:
                         if is_class_conflict(kelas, s_start, s_end):
                             continue
-                        date_key_new = s_start.strftime("%Y-%m-%d")
-                        shift_key_new = format_time_range(s_start, s_end)
+                        date_key_new = day_key(s_start.date())
+                        shift_key_new = slot_key(s_start, s_end)
                         new_room = pick_free_room(s_start, date_key_new, shift_key_new, s_start, s_end,
-                                                 room_usage, allow_aula, bentuk_ujian, jumlah_mhs)
+                                                 used_normal, aula_count, allow_aula, bentuk_ujian, jumlah_mhs)
                         if new_room:
-                            hari_col = col_idx.get("HARI")
-                            tanggal_col = col_idx.get("TANGGAL")
-                            shift_col = col_idx.get("SHIFT")
-                            ruangan_col = col_idx.get("RUANGAN")
-                            
-                            max_col = max([c for c in [hari_col, tanggal_col, shift_col, ruangan_col] if c is not None])
-                            while len(row) <= max_col:
-                                row.append("")
-                            
-                            if hari_col is not None:
-                                row[hari_col] = weekday_name(s_start)
-                            if tanggal_col is not None:
-                                row[tanggal_col] = s_start.strftime("%d-%b-%y")
-                            if shift_col is not None:
-                                row[shift_col] = shift_key_new
-                            if ruangan_col is not None:
-                                row[ruangan_col] = new_room
-                            
-                            room_usage[date_key_new][shift_key_new][new_room] += 1
-                            if kelas:
-                                class_usage[kelas].append((s_start, s_end))
-                                class_daily_count[kelas][date_key_new] += 1
-                            
+                            move_row_to_slot(row, kelas, s_start, s_end, date_key_new, shift_key_new, new_room)
                             fixed_count += 1
                             found_new_slot = True
-                            print(f"Fixed row {idx+1}: New date {date_key_new}, time {shift_key_new}, room {new_room}")
+                            print(f"Fixed row {idx+1}: New date {DATE_ISO_BY_DATE[s_start.date()]}, time {format_time_range(s_start, s_end)}, room {new_room}")
                             break
                     if found_new_slot:
                         break
@@ -374,139 +491,41 @@ def main():
     else:
         print(f"\nNo entries to fix.")
     
-    # Write output CSV
+    # Write output CSV (path sama dengan input: kalau tidak ada baris yang diubah, tidak perlu ditulis ulang)
     output_csv = base / "jadwal-uts-fix.csv"
-    with output_csv.open("w", encoding="utf-8", newline="") as f:
-        writer = csv.writer(f, delimiter=";")
-        writer.writerow(header)
-        for row in rows:
-            writer.writerow(row)
-    
-    print(f"Output CSV written to {output_csv.name}")
+    if fixed_count:
+        with output_csv.open("w", encoding="utf-8", newline="", buffering=CSV_BUFFER_SIZE) as f:
+            writer = csv.writer(f, delimiter=";")
+            writer.writerow(header)
+            writer.writerows(rows)
+        print(f"Output CSV written to {output_csv.name}")
+    else:
+        print(f"No rows changed, {output_csv.name} left as is")
     
     # Write output Excel dengan filter dan auto-adjust
     output_xlsx = base / "jadwal-uts-fix.xlsx"
     if pd is not None:
         try:
-            # Konversi rows ke DataFrame
-            data_rows = []
-            for row in rows:
-                # Pastikan row memiliki jumlah kolom yang sama dengan header
-                padded_row = row + [""] * (len(header) - len(row))
-                padded_row = padded_row[:len(header)]
-                data_rows.append(padded_row)
+            # Konversi rows ke DataFrame (rows sudah di-pad); baris hanya di-slice jika ada
+            # yang lebih panjang dari header, selain itu list rows dipakai langsung
+            if any(len(row) > n_cols for row in rows):
+                df = pd.DataFrame([row[:n_cols] for row in rows], columns=header)
+            else:
+                df = pd.DataFrame(rows, columns=header)
             
-            df = pd.DataFrame(data_rows, columns=header)
+            # Lebar kolom & panjang teks dihitung sekali, dipakai engine mana pun
+            layout = excel_layout(df)
             
             # Prioritaskan xlsxwriter
             try:
-                with pd.ExcelWriter(output_xlsx, engine="xlsxwriter") as writer:  # type: ignore
-                    df.to_excel(writer, index=False, sheet_name="Sheet1")
-                    workbook = writer.book
-                    worksheet = writer.sheets["Sheet1"]
-                    
-                    # Hitung dimensi data
-                    last_row = len(df)
-                    last_col = len(df.columns) - 1
-                    
-                    # Terapkan autofilter pada header
-                    worksheet.autofilter(0, 0, last_row, last_col)
-                    
-                    # Freeze header baris pertama
-                    worksheet.freeze_panes(1, 0)
-                    
-                    # Format header: bold
-                    header_format = workbook.add_format({"bold": True, "bg_color": "#D3D3D3"})
-                    for col_num, col_name in enumerate(df.columns):
-                        worksheet.write(0, col_num, col_name, header_format)
-                    
-                    # Auto-resize kolom dan set wrap text
-                    wrap_format = workbook.add_format({"text_wrap": True, "valign": "top"})
-                    col_widths = {}
-                    for c, col_name in enumerate(df.columns):
-                        series = df[col_name].astype(str)
-                        # Hitung max length termasuk header
-                        max_len = max([len(str(col_name))] + [len(str(x)) for x in series.tolist()])
-                        width = max(10, min(60, max_len + 2))
-                        col_widths[c] = width
-                        worksheet.set_column(c, c, width, wrap_format)
-                    
-                    # Auto-adjust row height berdasarkan konten
-                    for row_idx in range(1, last_row + 1):  # Mulai dari 1 (skip header)
-                        max_lines = 1
-                        for col_idx, col_name in enumerate(df.columns):
-                            cell_value = str(df.iloc[row_idx - 1, col_idx])
-                            if cell_value:
-                                # Hitung jumlah baris berdasarkan panjang teks dan lebar kolom
-                                col_width = col_widths.get(col_idx, 10)
-                                text_length = len(cell_value)
-                                # Estimasi: sekitar 8 karakter per unit lebar kolom
-                                chars_per_line = max(8, int(col_width * 8))
-                                lines = max(1, (text_length + chars_per_line - 1) // chars_per_line)
-                                max_lines = max(max_lines, lines)
-                        # Set tinggi baris (15 point per baris, minimum 15)
-                        row_height = max(15, min(60, max_lines * 15))
-                        worksheet.set_row(row_idx, row_height)
-                    
+                write_formatted_excel(output_xlsx, df, "xlsxwriter", layout)
                 print(f"Excel file created successfully with xlsxwriter")
                     
             except Exception as e_xlsxwriter:
                 # Fallback ke openpyxl jika xlsxwriter tidak ada
                 print(f"xlsxwriter failed: {e_xlsxwriter}, trying openpyxl...")
                 try:
-                    from openpyxl import load_workbook  # type: ignore
-                    from openpyxl.styles import Alignment, Font, PatternFill  # type: ignore
-                    from openpyxl.utils import get_column_letter  # type: ignore
-                    
-                    with pd.ExcelWriter(output_xlsx, engine="openpyxl") as writer:  # type: ignore
-                        df.to_excel(writer, index=False, sheet_name="Sheet1")
-                        ws = writer.book["Sheet1"]
-                        
-                        # Set auto filter untuk seluruh area data
-                        ws.auto_filter.ref = ws.dimensions
-                        
-                        # Freeze header baris pertama
-                        ws.freeze_panes = "A2"
-                        
-                        # Format header: bold dan background abu-abu
-                        header_fill = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
-                        header_font = Font(bold=True)
-                        for cell in ws[1]:
-                            cell.font = header_font
-                            cell.fill = header_fill
-                            cell.alignment = Alignment(horizontal="center", vertical="center")
-                        
-                        # Auto-resize kolom dan set wrap text
-                        wrap_alignment = Alignment(wrap_text=True, vertical="top")
-                        for idx, col_name in enumerate(df.columns, start=1):
-                            series = df[col_name].astype(str)
-                            max_len = max([len(str(col_name))] + [len(str(x)) for x in series.tolist()])
-                            width = max(10, min(60, max_len + 2))
-                            col_letter = get_column_letter(idx)
-                            ws.column_dimensions[col_letter].width = width
-                            
-                            # Set wrap text untuk semua cell di kolom ini
-                            for row_idx in range(2, len(df) + 2):  # Mulai dari baris 2 (skip header)
-                                cell = ws[f"{col_letter}{row_idx}"]
-                                cell.alignment = wrap_alignment
-                        
-                        # Auto-adjust row height berdasarkan konten
-                        for row_idx in range(2, len(df) + 2):  # Mulai dari baris 2 (skip header)
-                            max_lines = 1
-                            for col_idx, col_name in enumerate(df.columns, start=1):
-                                cell_value = str(df.iloc[row_idx - 2, col_idx - 1])
-                                if cell_value:
-                                    col_letter = get_column_letter(col_idx)
-                                    col_width = ws.column_dimensions[col_letter].width
-                                    text_length = len(cell_value)
-                                    # Estimasi: sekitar 7 karakter per unit lebar kolom
-                                    chars_per_line = max(7, int(col_width * 7))
-                                    lines = max(1, (text_length + chars_per_line - 1) // chars_per_line)
-                                    max_lines = max(max_lines, lines)
-                            # Set tinggi baris dalam points (15 points per baris, minimum 15)
-                            row_height = max(15, min(60, max_lines * 15))
-                            ws.row_dimensions[row_idx].height = row_height
-                        
+                    write_formatted_excel(output_xlsx, df, "openpyxl", layout)
                     print(f"Excel file created successfully with openpyxl")
                         
                 except Exception as e_openpyxl:
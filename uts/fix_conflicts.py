@@ -1,7 +1,9 @@
 import csv
 import random
-from datetime import datetime, timedelta, time
+import sys
+from datetime import date, datetime, timedelta, time
 from collections import defaultdict
+from functools import lru_cache
 from pathlib import Path
 
 try:
@@ -19,23 +21,33 @@ SHIFT_DURATION_MIN = 120
 BLACKLIST_MON_WED_SUFFIXES = {"KTT 2.08", "KTT 2.07", "KTT 2.06", "KTT 2.05", "KTT 2.04"}
 BLACKLIST_MON_FRI_SUFFIXES = {"KTT 2.09"}
 
+# Usage map untuk baris ke-USAGE_PANDAS_MIN_ROWS dst. dibangun secara vektor dengan pandas (jika terpasang)
+USAGE_PANDAS_MIN_ROWS = 50_000
+
 ALL_ROOMS = []
+# Nama ruangan -> bitmask posisinya di ALL_ROOMS (bit i = ALL_ROOMS[i])
+ROOM_BITS: dict[str, int] = {}
+
+UTS_DATES = frozenset(START_DATE.date() + timedelta(days=i) for i in range((END_DATE - START_DATE).days + 1))
 
 def is_within_uts_week(date_dt: datetime) -> bool:
-    return START_DATE.date() <= date_dt.date() <= END_DATE.date()
+    return date_dt.date() in UTS_DATES
+
+@lru_cache(maxsize=None)
+def room_blacklist_mask(room: str) -> int:
+    """Bit w = 1 jika ruangan diblacklist pada weekday w (0 = Senin); dihitung sekali per ruangan."""
+    mask = 0
+    if room.endswith(tuple(BLACKLIST_MON_FRI_SUFFIXES)):
+        mask |= 0b11111
+    if room.endswith(tuple(BLACKLIST_MON_WED_SUFFIXES)):
+        mask |= 0b00111
+    return mask
 
 def is_room_blacklisted_on_date(room: str, date_dt: datetime) -> bool:
     """Return True jika ruangan diblacklist pada tanggal tersebut."""
     if not is_within_uts_week(date_dt):
         return False
-    weekday = date_dt.weekday()
-    for suf in BLACKLIST_MON_FRI_SUFFIXES:
-        if room.endswith(suf) and weekday <= 4:
-            return True
-    for suf in BLACKLIST_MON_WED_SUFFIXES:
-        if room.endswith(suf) and weekday <= 2:
-            return True
-    return False
+    return bool(room_blacklist_mask(room) >> date_dt.weekday() & 1)
 
 def load_rooms_from_csv(rooms_csv_path: Path) -> list[str]:
     rooms = []
@@ -52,47 +64,79 @@ def load_rooms_from_csv(rooms_csv_path: Path) -> list[str]:
         print(f"Error loading rooms: {e}")
     return rooms
 
-def parse_existing_datetime(hari: str, tanggal: str, shift: str) -> tuple[datetime, datetime] | None:
-    if not tanggal or not shift:
+def build_room_bits(rooms: list[str]) -> dict[str, int]:
+    """Satu bit per nama ruangan (posisi kemunculan pertama); nama duplikat di CSV tidak dapat bit sendiri."""
+    bits = {}
+    for i, room in enumerate(rooms):
+        bits.setdefault(room, 1 << i)
+    return bits
+
+def iter_bits(mask: int):
+    """Index bit yang menyala, dari yang terkecil."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def write_log(lines: list[str]) -> None:
+    """Tulis pesan per-row sekaligus (satu write, bukan satu print per baris)."""
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
+    lines.clear()
+
+_SHIFT_STRIP = str.maketrans("", "", " \t")
+
+@lru_cache(maxsize=4096)
+def parse_tanggal(tanggal: str) -> date | None:
+    """Parse TANGGAL saja (di-cache: tanggal unik di CSV sedikit)."""
+    if not tanggal:
         return None
     date_formats = ["%d-%b-%y", "%d/%m/%Y", "%d-%m-%Y"]
-    date_dt = None
     for fmt in date_formats:
         try:
-            date_dt = datetime.strptime(tanggal.strip(), fmt)
-            break
+            return datetime.strptime(tanggal.strip(), fmt).date()
         except Exception:
             continue
-    if date_dt is None:
+    return None
+
+@lru_cache(maxsize=4096)
+def parse_existing_datetime(tanggal: str, shift: str) -> tuple[datetime, datetime] | None:
+    """Parse TANGGAL + SHIFT (hasil di-cache: kombinasi unik di CSV sedikit)."""
+    if not tanggal or not shift:
+        return None
+    row_date = parse_tanggal(tanggal)
+    if row_date is None:
         return None
-    parts = shift.split("-")
-    if len(parts) != 2:
+    start_s, sep, end_s = shift.partition("-")
+    if not sep or "-" in end_s:
         return None
-    start_s = parts[0].strip().replace(" ", "").replace("\t", "")
-    end_s = parts[1].strip().replace(" ", "").replace("\t", "")
+    # Buang spasi/tab dalam satu pass (int() sendiri toleran whitespace lain di ujung)
+    start_s = start_s.translate(_SHIFT_STRIP)
+    end_s = end_s.translate(_SHIFT_STRIP)
     try:
         h1, m1 = map(int, start_s.split("."))
         h2, m2 = map(int, end_s.split("."))
     except Exception:
         return None
-    start_dt = datetime.combine(date_dt.date(), time(h1, m1))
-    end_dt = datetime.combine(date_dt.date(), time(h2, m2))
+    start_dt = datetime.combine(row_date, time(h1, m1))
+    end_dt = datetime.combine(row_date, time(h2, m2))
     return start_dt, end_dt
 
 def format_time_range(start_dt: datetime, end_dt: datetime) -> str:
     return f"{start_dt:%H.%M} - {end_dt:%H.%M}"
 
+def day_key(d: date) -> int:
+    """date -> nomor hari (ordinal), key tanggal di usage map (int, bukan string 'YYYY-MM-DD')."""
+    return d.toordinal()
+
+def slot_key(start_dt: datetime, end_dt: datetime) -> int:
+    """(mulai, selesai) -> int menit-dalam-hari, key shift di usage map (bukan string 'HH.MM - HH.MM')."""
+    return (start_dt.hour * 60 + start_dt.minute) * 1440 + end_dt.hour * 60 + end_dt.minute
+
+WEEKDAY_NAMES = ("SENIN", "SELASA", "RABU", "KAMIS", "JUM'AT", "SABTU", "MINGGU")
+
 def weekday_name(dt: datetime) -> str:
-    mapping = {
-        0: "SENIN",
-        1: "SELASA",
-        2: "RABU",
-        3: "KAMIS",
-        4: "JUM'AT",
-        5: "SABTU",
-        6: "MINGGU",
-    }
-    return mapping[dt.weekday()]
+    return WEEKDAY_NAMES[dt.weekday()]
 
 def generate_daily_shifts(start_date: datetime) -> list[tuple[datetime, datetime]]:
     shifts = []
@@ -109,92 +153,176 @@ def iter_allowed_dates():
             yield cur
         cur += timedelta(days=1)
 
-def pick_free_room(date_dt: datetime, date_key: str, shift_key: str, start_dt: datetime, end_dt: datetime, 
-                   room_usage: dict, allow_aula: bool = False, bentuk_ujian: str = "", jumlah_mhs: int = 0) -> str | None:
-    used_counts = room_usage.get(date_key, {}).get(shift_key, {})
-    normal_candidates = []
-    aula_candidates = []
-    
-    for r in ALL_ROOMS:
-        if is_room_blacklisted_on_date(r, date_dt):
+ALLOWED_DATES = tuple(day_dt.date() for day_dt in iter_allowed_dates())
+
+@lru_cache(maxsize=None)
+def dates_to_try_from(original_date: date | None) -> tuple[date, ...]:
+    """Urutan tanggal yang dicoba: tanggal asli dulu (jika ada), lalu tanggal UTS lainnya; di-cache per tanggal asli."""
+    if original_date is None:
+        return ALLOWED_DATES
+    return (original_date,) + tuple(d for d in ALLOWED_DATES if d != original_date)
+
+@lru_cache(maxsize=None)
+def day_slots(d: date) -> tuple[int, str, str, str, tuple[tuple[datetime, datetime, int, str], ...]]:
+    """(date_key, tanggal ISO, label TANGGAL, nama hari, slot (mulai, selesai, shift_key, label SHIFT)) untuk tanggal d.
+
+    Dihitung sekali per tanggal; key int untuk usage map, string hanya untuk ditulis/di-log.
+    """
+    day_dt = datetime.combine(d, time())
+    shifts = tuple((s, e, slot_key(s, e), format_time_range(s, e)) for s, e in generate_daily_shifts(day_dt))
+    return day_key(d), day_dt.strftime("%Y-%m-%d"), day_dt.strftime("%d-%b-%y"), weekday_name(day_dt), shifts
+
+def is_aula(room: str) -> bool:
+    return room.strip().upper() == "AULA"
+
+@lru_cache(maxsize=None)
+def allowed_rooms_on(d: date) -> tuple[int, tuple[str, ...]]:
+    """(bitmask ruangan normal, ruangan AULA) yang tidak diblacklist pada tanggal d, urut ALL_ROOMS.
+
+    Tiap nama ruangan hanya dihitung sekali (kemunculan pertama), supaya ruangan yang tercantum
+    dua kali di CSV tidak masuk pool dua kali dan terpakai ganda di slot yang sama.
+    """
+    day_dt = datetime.combine(d, time())
+    normal_mask = 0
+    aula_rooms = []
+    seen = set()
+    for i, r in enumerate(ALL_ROOMS):
+        if r in seen or is_room_blacklisted_on_date(r, day_dt):
             continue
-        
-        used_count = used_counts.get(r, 0)
-        
-        if r.strip().upper() == "AULA":
-            if not allow_aula:
-                continue
-            bentuk = (bentuk_ujian or "").strip().lower()
-            if bentuk != "ujian tulis" or jumlah_mhs <= 0 or jumlah_mhs < 40:
-                continue
-            if used_count < 2:
-                aula_candidates.append(r)
+        seen.add(r)
+        if is_aula(r):
+            aula_rooms.append(r)
         else:
-            if used_count == 0:
-                normal_candidates.append(r)
+            normal_mask |= 1 << i
+    return normal_mask, tuple(aula_rooms)
+
+def pick_free_room(date_dt: datetime, date_key: int, shift_key: int, start_dt: datetime, end_dt: datetime, 
+                   room_usage: dict, used_rooms: dict, free_normal: dict, free_aula: dict, allow_aula: bool = False,
+                   bentuk_ujian: str = "", jumlah_mhs: int = 0) -> str | None:
+    """Ambil (pop) satu ruangan dari pool slot (date_key, shift_key); ruangan yang dikembalikan langsung dianggap terpakai.
+
+    Pool per slot dibangun sekali (ruangan normal: allowed & ~used_rooms) lalu di-shuffle, jadi tiap pick cukup pop().
+    AULA boleh dipakai 2 ujian per slot, jadi masuk pool sebanyak sisa kapasitasnya.
+    """
+    normal_mask, aula_rooms = allowed_rooms_on(date_dt.date())
+    key = (date_key, shift_key)
     
     # Prioritize normal rooms first, then AULA if allowed
-    if normal_candidates:
-        return random.choice(normal_candidates)
-    if aula_candidates:
-        return random.choice(aula_candidates)
+    pool = free_normal.get(key)
+    if pool is None:
+        pool = free_normal[key] = [ALL_ROOMS[i] for i in iter_bits(normal_mask & ~used_rooms.get(key, 0))]
+        random.shuffle(pool)
+    if pool:
+        return pool.pop()
+    if not allow_aula:
+        return None
+    bentuk = (bentuk_ujian or "").strip().lower()
+    if bentuk != "ujian tulis" or jumlah_mhs <= 0 or jumlah_mhs < 40:
+        return None
+    aula_pool = free_aula.get(key)
+    if aula_pool is None:
+        aula_pool = free_aula[key] = [
+            r for r in aula_rooms for _ in range(2 - room_usage.get((date_key, shift_key, r), 0))
+        ]
+        random.shuffle(aula_pool)
+    if aula_pool:
+        return aula_pool.pop()
     return None
 
+def build_usage_pandas(rows: list[list[str]], cols: tuple, skip: set[int],
+                       start: int = 0) -> tuple[dict, defaultdict, defaultdict]:
+    """Versi vektor (pandas) dari build usage map di main() untuk CSV besar; hasilnya sama persis.
+
+    cols = index kolom (HARI, TANGGAL, SHIFT, RUANGAN, KELAS, NAMA DOSEN); skip = row index yang konflik.
+    Hanya rows[start:] yang dihitung (index tetap index asli di rows).
+    Parsing tanggal/shift hanya dilakukan sekali per pasangan (TANGGAL, SHIFT) unik.
+    """
+    df = pd.DataFrame(rows[start:], index=range(start, len(rows)))
+    
+    def col(i):
+        if i is None or i >= df.shape[1]:
+            return pd.Series("", index=df.index, dtype=object)
+        return df[i].fillna("").astype(str).str.strip()
+    
+    names = ["hari", "tanggal", "shift", "ruangan", "kelas", "dosen"]
+    data = pd.DataFrame({name: col(i) for name, i in zip(names, cols)})
+    data = data[~data.index.isin(skip) & data["hari"].ne("") & data["tanggal"].ne("") & data["shift"].ne("")]
+    
+    pairs = data[["tanggal", "shift"]].drop_duplicates()
+    parsed = [parse_existing_datetime(t, s) for t, s in zip(pairs["tanggal"], pairs["shift"])]
+    # .loc dengan mask: list kosong lewat [] akan memilih 0 kolom, bukan 0 baris
+    pairs = pairs.loc[[p is not None for p in parsed]]
+    parsed = [p for p in parsed if p is not None]
+    pairs = pairs.assign(
+        # dtype object: tetap datetime Python (bukan Timestamp) seperti loop per baris
+        iv=pd.Series(parsed, index=pairs.index, dtype=object),
+        date_key=[day_key(start_dt.date()) for start_dt, _ in parsed],
+        shift_key=[slot_key(start_dt, end_dt) for start_dt, end_dt in parsed],
+    )
+    # Inner merge mempertahankan urutan baris kiri (urutan CSV)
+    data = data.merge(pairs, on=["tanggal", "shift"], how="inner")
+    
+    used = data[data["ruangan"].ne("")]
+    room_usage = {
+        key: int(n) for key, n in used.groupby(["date_key", "shift_key", "ruangan"], sort=False).size().items()
+    }
+    by_kelas = data[data["kelas"].ne("")].groupby(["kelas", "date_key"], sort=False)["iv"].agg(list)
+    by_dosen = data[data["dosen"].ne("")].groupby(["dosen", "date_key"], sort=False)["iv"].agg(list)
+    return room_usage, defaultdict(list, by_kelas.to_dict()), defaultdict(list, by_dosen.to_dict())
+
+def iter_conflict_rows(path: Path, columns: tuple[str, ...]):
+    """Yield tuple field (strip + sys.intern) sesuai urutan columns untuk tiap baris file konflik.
+
+    Pakai csv.reader + index kolom dari header (bukan DictReader yang membuat dict per baris);
+    kolom yang tidak ada atau baris yang lebih pendek menghasilkan "".
+    """
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        col_idx = {name.strip().upper(): i for i, name in enumerate(header)}
+        idxs = [col_idx.get(c) for c in columns]
+        for row in reader:
+            if not row:
+                continue
+            n = len(row)
+            yield tuple(sys.intern(row[i].strip()) if i is not None and i < n else "" for i in idxs)
+
 def read_conflict_files(base: Path):
-    """Baca semua file konflik dan kumpulkan row indices yang konflik."""
+    """Baca semua file konflik dan kumpulkan row indices yang konflik.
+
+    Field di-intern (sys.intern) dan hasilnya frozenset: lookup per baris jadwal jadi murah.
+    """
     conflict_indices = set()
     
     # Baca konflik kelas
     class_conflict_file = base / "kelas-conflicts.csv"
     if class_conflict_file.exists():
-        with class_conflict_file.open("r", encoding="utf-8-sig", newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                kelas = row.get("KELAS", "").strip()
-                tanggal = row.get("TANGGAL", "").strip()
-                shift1 = row.get("SHIFT_1", "").strip()
-                shift2 = row.get("SHIFT_2", "").strip()
-                kode1 = row.get("KODE 1", "").strip()
-                kode2 = row.get("KODE 2", "").strip()
-                if kelas and tanggal:
-                    # Mark both entries as conflicted
-                    conflict_indices.add((kelas, tanggal, shift1, kode1))
-                    conflict_indices.add((kelas, tanggal, shift2, kode2))
+        columns = ("KELAS", "TANGGAL", "SHIFT_1", "SHIFT_2", "KODE 1", "KODE 2")
+        for kelas, tanggal, shift1, shift2, kode1, kode2 in iter_conflict_rows(class_conflict_file, columns):
+            if kelas and tanggal:
+                # Mark both entries as conflicted
+                conflict_indices.add((kelas, tanggal, shift1, kode1))
+                conflict_indices.add((kelas, tanggal, shift2, kode2))
     
     # Baca konflik ruangan
     room_conflict_file = base / "ruangan-conflicts.csv"
     if room_conflict_file.exists():
-        with room_conflict_file.open("r", encoding="utf-8-sig", newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                kelas = row.get("KELAS", "").strip()
-                tanggal = row.get("TANGGAL", "").strip()
-                shift = row.get("SHIFT", "").strip()
-                kode = row.get("KODE", "").strip()
-                if kelas and tanggal and shift:
-                    conflict_indices.add((kelas, tanggal, shift, kode))
+        columns = ("KELAS", "TANGGAL", "SHIFT", "KODE")
+        for kelas, tanggal, shift, kode in iter_conflict_rows(room_conflict_file, columns):
+            if kelas and tanggal and shift:
+                conflict_indices.add((kelas, tanggal, shift, kode))
     
-    # Baca konflik dosen
+    # Baca konflik dosen (file dosen tidak punya kolom kode)
     dosen_conflict_file = base / "dosen-conflicts.csv"
     if dosen_conflict_file.exists():
-        with dosen_conflict_file.open("r", encoding="utf-8-sig", newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                kelas1 = row.get("KELAS_1", "").strip()
-                kelas2 = row.get("KELAS_2", "").strip()
-                tanggal1 = row.get("TANGGAL_1", "").strip()
-                tanggal2 = row.get("TANGGAL_2", "").strip()
-                shift1 = row.get("SHIFT_1", "").strip()
-                shift2 = row.get("SHIFT_2", "").strip()
-                # Ambil kode dari nama mata kuliah jika ada
-                mk1 = row.get("MATA KULIAH 1", "").strip()
-                mk2 = row.get("MATA KULIAH 2", "").strip()
-                if kelas1 and tanggal1 and shift1:
-                    conflict_indices.add((kelas1, tanggal1, shift1, ""))
-                if kelas2 and tanggal2 and shift2:
-                    conflict_indices.add((kelas2, tanggal2, shift2, ""))
+        columns = ("KELAS_1", "KELAS_2", "TANGGAL_1", "TANGGAL_2", "SHIFT_1", "SHIFT_2")
+        for kelas1, kelas2, tanggal1, tanggal2, shift1, shift2 in iter_conflict_rows(dosen_conflict_file, columns):
+            if kelas1 and tanggal1 and shift1:
+                conflict_indices.add((kelas1, tanggal1, shift1, ""))
+            if kelas2 and tanggal2 and shift2:
+                conflict_indices.add((kelas2, tanggal2, shift2, ""))
     
-    return conflict_indices
+    return frozenset(conflict_indices)
 
 def main():
     base = Path(__file__).parent
@@ -202,8 +330,10 @@ def main():
     rooms_csv = base / "ruangan-kampus.csv"
     
     # Load rooms
-    global ALL_ROOMS
+    global ALL_ROOMS, ROOM_BITS
     ALL_ROOMS = load_rooms_from_csv(rooms_csv)
+    ROOM_BITS = build_room_bits(ALL_ROOMS)
+    allowed_rooms_on.cache_clear()
     print(f"Loaded {len(ALL_ROOMS)} rooms")
     
     # Baca conflict indices
@@ -214,120 +344,153 @@ def main():
         print("No conflicts found. Exiting.")
         return
     
-    # Read all rows from CSV
+    # Baca CSV secara streaming: row disimpan (untuk ditulis ulang) sambil langsung diproses
     rows = []
+    # Pesan per-row dikumpulkan lalu ditulis sekaligus setelah loop
+    log_lines: list[str] = []
+    # Sejajar dengan rows: TANGGAL yang sudah di-parse (None jika kosong/tidak valid)
+    row_dates: list[date | None] = []
     with input_csv.open("r", encoding="utf-8-sig", newline="") as f:
         reader = csv.reader(f, delimiter=";")
         header = next(reader)
-        rows = list(reader)
+        
+        col_idx = {name.strip().upper(): i for i, name in enumerate(header)}
     
-    col_idx = {name.strip().upper(): i for i, name in enumerate(header)}
+        # Index kolom dicari sekali (konstan untuk semua baris)
+        hari_i = col_idx.get("HARI")
+        tanggal_i = col_idx.get("TANGGAL")
+        shift_i = col_idx.get("SHIFT")
+        ruangan_i = col_idx.get("RUANGAN")
+        kelas_i = col_idx.get("KELAS")
+        dosen_i = col_idx.get("NAMA DOSEN")
+        kode_i = col_idx.get("KODE MATA KULIAH")
+        bentuk_i = col_idx.get("BENTUK UJIAN")
+        jumlah_i = col_idx.get("JUMLAH MAHASISWA")
     
-    def get(row, key, default=""):
-        i = col_idx.get(key, None)
-        if i is None or i >= len(row):
-            return default
-        return row[i].strip()
+        def field(row, i):
+            if i is None or i >= len(row):
+                return ""
+            return row[i].strip()
     
-    # Identifikasi row indices yang konflik
-    conflicted_row_indices = []
-    for idx, row in enumerate(rows):
-        if not any(row):
-            continue
+        # Satu kali jalan sambil membaca: identifikasi row yang konflik, sekaligus build usage map
+        # dari semua entry yang TIDAK konflik. Row mulai index pandas_from tidak dihitung per row:
+        # usage-nya ditambahkan dengan pandas setelah file selesai dibaca.
+        usage_with_pandas = False
+        pandas_from = max(USAGE_PANDAS_MIN_ROWS, 0) if pd is not None else -1
+        conflicted_row_indices = []
+        # (date_key, shift_key, ruangan) -> jumlah pemakaian; date_key/shift_key int (day_key/slot_key)
+        room_usage: dict[tuple[int, int, str], int] = {}
+        # Per (kelas, date_key) / (dosen, date_key): interval ujian pada tanggal itu.
+        # Overlap hanya mungkin di tanggal yang sama; len(list) kelas = jumlah ujian kelas hari itu.
+        class_usage = defaultdict(list)
+        dosen_usage = defaultdict(list)
+    
+        for idx, row in enumerate(reader):
+            rows.append(row)
+            if idx == pandas_from:
+                usage_with_pandas = True
+            # Row kosong tidak perlu dicek terpisah: kelas/tanggal/shift/hari kosong sudah di-skip di bawah
         
-        kelas = get(row, "KELAS")
-        tanggal = get(row, "TANGGAL")
-        shift = get(row, "SHIFT")
-        kode = get(row, "KODE MATA KULIAH")
+            hari = field(row, hari_i)
+            tanggal = sys.intern(field(row, tanggal_i))
+            row_dates.append(parse_tanggal(tanggal))
+            shift = sys.intern(field(row, shift_i))
+            kelas = sys.intern(field(row, kelas_i))
         
-        if not kelas or not tanggal or not shift:
-            continue
+            if kelas and tanggal and shift:
+                # Check if this row is in conflict list
+                key = (kelas, tanggal, shift, sys.intern(field(row, kode_i)))
+                # Try with empty kode too (for dosen conflicts where kode might not be available)
+                key_no_kode = (kelas, tanggal, shift, "")
+            
+                if key in conflict_keys or key_no_kode in conflict_keys:
+                    conflicted_row_indices.append(idx)
+                    log_lines.append(f"Row {idx+1}: CONFLICT - {kelas} {tanggal} {shift}")
+                    continue
+        
+            if usage_with_pandas or not hari or not tanggal or not shift:
+                continue
+        
+            parsed = parse_existing_datetime(tanggal, shift)
+            if parsed is None:
+                continue
         
-        # Check if this row is in conflict list
-        key = (kelas, tanggal, shift, kode)
-        # Try with empty kode too (for dosen conflicts where kode might not be available)
-        key_no_kode = (kelas, tanggal, shift, "")
+            start_dt, end_dt = parsed
+            date_key = day_key(start_dt.date())
+            shift_key = slot_key(start_dt, end_dt)
         
-        if key in conflict_keys or key_no_kode in conflict_keys:
-            conflicted_row_indices.append(idx)
-            print(f"Row {idx+1}: CONFLICT - {kelas} {tanggal} {shift}")
+            ruangan = field(row, ruangan_i)
+            dosen = field(row, dosen_i)
+            if ruangan:
+                room_key = (date_key, shift_key, ruangan)
+                room_usage[room_key] = room_usage.get(room_key, 0) + 1
+            if kelas:
+                class_usage[(kelas, date_key)].append((start_dt, end_dt))
+            if dosen:
+                dosen_usage[(dosen, date_key)].append((start_dt, end_dt))
     
-    print(f"\nTotal {len(conflicted_row_indices)} rows need to be regenerated")
+    if usage_with_pandas:
+        # Row sebelum pandas_from sudah masuk usage map; pandas hanya menambahkan sisanya
+        tail_room, tail_class, tail_dosen = build_usage_pandas(
+            rows, (hari_i, tanggal_i, shift_i, ruangan_i, kelas_i, dosen_i),
+            {i for i in conflicted_row_indices if i >= pandas_from}, pandas_from
+        )
+        for room_key, n in tail_room.items():
+            room_usage[room_key] = room_usage.get(room_key, 0) + n
+        for usage_key, intervals in tail_class.items():
+            class_usage[usage_key].extend(intervals)
+        for usage_key, intervals in tail_dosen.items():
+            dosen_usage[usage_key].extend(intervals)
     
-    # Build usage map from all NON-conflicted entries
-    room_usage = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
-    class_usage = defaultdict(list)
-    class_daily_count = defaultdict(lambda: defaultdict(int))
-    dosen_usage = defaultdict(list)
+    # Proses row konflik dikelompokkan per (kelas, tanggal): usage kelas yang sama dipakai berurutan,
+    # dan row identik berdekatan sehingga failed_searches lebih sering kena. Urutan asli dipertahankan dalam grup.
+    conflicted_row_indices.sort(key=lambda i: (field(rows[i], kelas_i), field(rows[i], tanggal_i)))
     
-    for idx, row in enumerate(rows):
-        if idx in conflicted_row_indices:
-            continue
-        if not any(row):
-            continue
-        
-        hari = get(row, "HARI")
-        tanggal = get(row, "TANGGAL")
-        shift = get(row, "SHIFT")
-        ruangan = get(row, "RUANGAN")
-        kelas = get(row, "KELAS")
-        dosen = get(row, "NAMA DOSEN").strip()
-        
-        if not hari or not tanggal or not shift:
-            continue
-        
-        parsed = parse_existing_datetime(hari, tanggal, shift)
-        if parsed is None:
-            continue
-        
-        start_dt, end_dt = parsed
-        date_key = start_dt.strftime("%Y-%m-%d")
-        shift_key = format_time_range(start_dt, end_dt)
-        
-        if ruangan:
-            room_usage[date_key][shift_key][ruangan] += 1
-        if kelas:
-            class_usage[kelas].append((start_dt, end_dt))
-            class_daily_count[kelas][date_key] += 1
-        if dosen:
-            dosen_usage[dosen].append((start_dt, end_dt))
+    write_log(log_lines)
+    print(f"\nTotal {len(conflicted_row_indices)} rows need to be regenerated")
     
     # Conflict checking functions
-    def is_class_conflict(kelas: str, start_dt: datetime, end_dt: datetime) -> bool:
+    def is_class_conflict(kelas: str, date_key: int, start_dt: datetime, end_dt: datetime) -> bool:
         if not kelas:
             return False
-        for s, e in class_usage.get(kelas, []):
+        same_day = class_usage.get((kelas, date_key), ())
+        # Maksimal 2 ujian per hari per kelas
+        if len(same_day) >= 2:
+            return True
+        for s, e in same_day:
             if not (end_dt <= s or start_dt >= e):
                 return True
-        date_key = start_dt.strftime("%Y-%m-%d")
-        if class_daily_count[kelas][date_key] >= 2:
-            return True
         return False
     
-    def is_dosen_conflict(dosen: str, start_dt: datetime, end_dt: datetime) -> bool:
+    def is_dosen_conflict(dosen: str, date_key: int, start_dt: datetime, end_dt: datetime) -> bool:
         if not dosen:
             return False
-        for s, e in dosen_usage.get(dosen, []):
+        for s, e in dosen_usage.get((dosen, date_key), ()):
             if not (end_dt <= s or start_dt >= e):
                 return True
         return False
     
-    def is_room_conflict(ruangan: str, date_key: str, shift_key: str) -> bool:
-        used_counts = room_usage.get(date_key, {}).get(shift_key, {})
-        count = used_counts.get(ruangan, 0)
-        if ruangan.strip().upper() == "AULA":
-            return count >= 2
-        else:
-            return count >= 1
+    # (date_key, shift_key) -> bitmask ruangan yang sudah terpakai minimal sekali
+    used_rooms: dict[tuple[int, int], int] = {}
+    for date_key, shift_key, ruangan in room_usage:
+        used_rooms[(date_key, shift_key)] = used_rooms.get((date_key, shift_key), 0) | ROOM_BITS.get(ruangan, 0)
+    
+    # (date_key, shift_key) -> pool ruangan normal / AULA yang masih bisa dipakai (diisi oleh pick_free_room)
+    free_normal = {}
+    free_aula = {}
     
     # Regenerate conflicted entries
+    # Kolom terjauh yang ditulis ulang; row yang lebih pendek di-pad saat dipindahkan
+    max_col = max((c for c in (hari_i, tanggal_i, shift_i, ruangan_i) if c is not None), default=-1)
     fixed_count = 0
+    # (kelas, dosen, allow_aula, tanggal asli) yang pencariannya gagal sejak penempatan terakhir
+    failed_searches = set()
     for idx in conflicted_row_indices:
         row = rows[idx]
-        kelas = get(row, "KELAS")
-        bentuk_ujian = get(row, "BENTUK UJIAN")
-        jumlah_mhs_str = get(row, "JUMLAH MAHASISWA")
-        dosen = get(row, "NAMA DOSEN").strip()
+        kelas = field(row, kelas_i)
+        bentuk_ujian = field(row, bentuk_i)
+        jumlah_mhs_str = field(row, jumlah_i)
+        dosen = field(row, dosen_i)
         
         try:
             jumlah_mhs = int(jumlah_mhs_str) if jumlah_mhs_str else 0
@@ -336,86 +499,81 @@ def main():
         
         allow_aula = (bentuk_ujian.strip().lower() == "ujian tulis" and jumlah_mhs >= 40)
         
-        found_new_slot = False
-        
         # Try to find new slot: first same date different time, then different dates
         # Start from the original date if possible
-        original_hari = get(row, "HARI")
-        original_tanggal = get(row, "TANGGAL")
+        original_hari = field(row, hari_i)
+        original_tanggal = field(row, tanggal_i)
         
-        # Try dates in order: original date first, then others
-        dates_to_try = []
-        if original_hari and original_tanggal:
-            parsed_orig = parse_existing_datetime(original_hari, original_tanggal, "07.30 - 09.30")
-            if parsed_orig:
-                dates_to_try.append(parsed_orig[0])
+        # Try dates in order: original date first, then others (tanggal sudah di-parse saat membaca)
+        original_date = row_dates[idx] if original_hari and original_tanggal else None
         
-        # Add other allowed dates
-        for day_dt in iter_allowed_dates():
-            if not dates_to_try or day_dt.date() != dates_to_try[0].date():
-                dates_to_try.append(day_dt)
+        # Pencarian yang sama persis sudah gagal dan belum ada penempatan baru sejak itu -> pasti gagal lagi
+        search_key = (kelas, dosen, allow_aula, original_date)
+        if search_key in failed_searches:
+            log_lines.append(f"Warning: Could not fix row {idx+1} (kelas: {kelas})")
+            continue
         
-        for day_dt in dates_to_try:
-            for s_start, s_end in generate_daily_shifts(day_dt):
-                if is_class_conflict(kelas, s_start, s_end):
-                    continue
-                if is_dosen_conflict(dosen, s_start, s_end):
-                    continue
-                
-                date_key_new = s_start.strftime("%Y-%m-%d")
-                shift_key_new = format_time_range(s_start, s_end)
-                
-                new_room = pick_free_room(s_start, date_key_new, shift_key_new, s_start, s_end,
-                                         room_usage, allow_aula, bentuk_ujian, jumlah_mhs)
-                
-                if new_room and not is_room_conflict(new_room, date_key_new, shift_key_new):
-                    # Update row
-                    hari_col = col_idx.get("HARI")
-                    tanggal_col = col_idx.get("TANGGAL")
-                    shift_col = col_idx.get("SHIFT")
-                    ruangan_col = col_idx.get("RUANGAN")
-                    
-                    max_col = max([c for c in [hari_col, tanggal_col, shift_col, ruangan_col] if c is not None])
-                    while len(row) <= max_col:
-                        row.append("")
-                    
-                    if hari_col is not None:
-                        row[hari_col] = weekday_name(s_start)
-                    if tanggal_col is not None:
-                        row[tanggal_col] = s_start.strftime("%d-%b-%y")
-                    if shift_col is not None:
-                        row[shift_col] = shift_key_new
-                    if ruangan_col is not None:
-                        row[ruangan_col] = new_room
-                    
-                    # Update usage maps
-                    room_usage[date_key_new][shift_key_new][new_room] += 1
-                    if kelas:
-                        class_usage[kelas].append((s_start, s_end))
-                        class_daily_count[kelas][date_key_new] += 1
-                    if dosen:
-                        dosen_usage[dosen].append((s_start, s_end))
-                    
-                    fixed_count += 1
-                    found_new_slot = True
-                    print(f"Fixed row {idx+1}: {kelas} -> {date_key_new} {shift_key_new} {new_room}")
-                    break
-            
-            if found_new_slot:
+        # Slot pertama yang feasible: kelas & dosen bebas, lalu ada ruangan dari pool.
+        # Key, label dan slot shift tiap tanggal sudah diformat sekali (day_slots di-cache);
+        # pick_free_room hanya dipanggil untuk slot yang lolos cek kelas/dosen, berhenti di hasil pertama.
+        candidate_slots = (
+            (date_key_new, date_iso, tanggal_label, hari_label, s_start, s_end, shift_key_new, shift_label)
+            for date_key_new, date_iso, tanggal_label, hari_label, shifts in map(day_slots, dates_to_try_from(original_date))
+            for s_start, s_end, shift_key_new, shift_label in shifts
+        )
+        for date_key_new, date_iso, tanggal_label, hari_label, s_start, s_end, shift_key_new, shift_label in candidate_slots:
+            if is_class_conflict(kelas, date_key_new, s_start, s_end):
+                continue
+            if is_dosen_conflict(dosen, date_key_new, s_start, s_end):
+                continue
+            # Ruangan dari pool pasti masih kosong di slot ini (langsung di-pop dari pool)
+            new_room = pick_free_room(s_start, date_key_new, shift_key_new, s_start, s_end, room_usage,
+                                      used_rooms, free_normal, free_aula, allow_aula, bentuk_ujian, jumlah_mhs)
+            if new_room:
                 break
+        else:
+            failed_searches.add(search_key)
+            log_lines.append(f"Warning: Could not fix row {idx+1} (kelas: {kelas})")
+            continue
+        # Usage berubah: hasil pencarian gagal sebelumnya tidak berlaku lagi
+        failed_searches.clear()
+        
+        # Update row
+        if len(row) <= max_col:
+            row.extend([""] * (max_col + 1 - len(row)))
+        
+        if hari_i is not None:
+            row[hari_i] = hari_label
+        if tanggal_i is not None:
+            row[tanggal_i] = tanggal_label
+        if shift_i is not None:
+            row[shift_i] = shift_label
+        if ruangan_i is not None:
+            row[ruangan_i] = new_room
+        
+        # Update usage maps
+        room_key = (date_key_new, shift_key_new, new_room)
+        room_usage[room_key] = room_usage.get(room_key, 0) + 1
+        slot = (date_key_new, shift_key_new)
+        used_rooms[slot] = used_rooms.get(slot, 0) | ROOM_BITS.get(new_room, 0)
+        if kelas:
+            class_usage[(kelas, date_key_new)].append((s_start, s_end))
+        if dosen:
+            dosen_usage[(dosen, date_key_new)].append((s_start, s_end))
         
-        if not found_new_slot:
-            print(f"Warning: Could not fix row {idx+1} (kelas: {kelas})")
+        fixed_count += 1
+        log_lines.append(f"Fixed row {idx+1}: {kelas} -> {date_iso} {shift_label} {new_room}")
     
+    write_log(log_lines)
     print(f"\nFixed {fixed_count} out of {len(conflicted_row_indices)} conflicted entries")
     
     # Write output
     output_csv = base / "jadwal-uts-fix.csv"
-    with output_csv.open("w", encoding="utf-8", newline="") as f:
+    # Buffer tulis 1 MiB + writerows (iterasi baris di dalam modul csv, bukan loop Python)
+    with output_csv.open("w", encoding="utf-8", newline="", buffering=1 << 20) as f:
         writer = csv.writer(f, delimiter=";")
         writer.writerow(header)
-        for row in rows:
-            writer.writerow(row)
+        writer.writerows(rows)
     
     print(f"Output written to {output_csv.name}")
     print("\nPlease run check_conflicts.py again to verify no conflicts remain.")
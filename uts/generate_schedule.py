@@ -1,7 +1,9 @@
 import csv
 import random
 from datetime import datetime, timedelta, time
-from collections import defaultdict
+from collections import defaultdict, deque
+from itertools import chain
+from operator import itemgetter
 from pathlib import Path
 
 try:
@@ -21,38 +23,75 @@ LUNCH_BREAK_START = time(12, 0)
 LUNCH_BREAK_END = time(13, 0)
 
 # Shifts resmi (tetap): 07.30-09.30, 10.00-12.00, 13.00-15.00, 15.30-17.30
-ALLOWED_SHIFT_STARTS = [time(7, 30), time(10, 0), time(13, 0), time(15, 30)]
+ALLOWED_SHIFT_STARTS = (time(7, 30), time(10, 0), time(13, 0), time(15, 30))
+
+# Format TANGGAL yang dikenali pada CSV input
+DATE_FORMATS = ("%d-%b-%y", "%d/%m/%Y", "%d-%m-%Y")
 
 # Daftar ruangan yang tersedia - akan dimuat dari ruangan-kampus.csv
 ALL_ROOMS = []
 
 # Blacklist ruangan berdasarkan hari (khusus minggu UTS 3-7 Nov 2025)
-BLACKLIST_MON_WED_SUFFIXES = {"KTT 2.08", "KTT 2.07", "KTT 2.06", "KTT 2.05", "KTT 2.04"}
-BLACKLIST_MON_FRI_SUFFIXES = {"KTT 2.09"}
+BLACKLIST_MON_WED_SUFFIXES = frozenset({"KTT 2.08", "KTT 2.07", "KTT 2.06", "KTT 2.05", "KTT 2.04"})
+BLACKLIST_MON_FRI_SUFFIXES = frozenset({"KTT 2.09"})
+
+
+# Weekday (0=Mon ... 6=Sun) tiap tanggal minggu UTS, key = date ordinal
+UTS_WEEKDAY = {
+    d.toordinal(): d.weekday()
+    for d in (START_DATE + timedelta(days=i) for i in range((END_DATE - START_DATE).days + 1))
+}
+
 
+# Cache: ruangan -> weekday (0=Mon ... 4=Fri) saat ruangan tersebut diblacklist
+_BLACKLIST_WEEKDAYS: dict[str, frozenset[int]] = {}
 
-def is_within_uts_week(date_dt: datetime) -> bool:
-    return START_DATE.date() <= date_dt.date() <= END_DATE.date()
+
+def blacklisted_weekdays(room: str) -> frozenset[int]:
+    """Weekday di mana ruangan diblacklist; suffix dicek sekali per ruangan."""
+    days = _BLACKLIST_WEEKDAYS.get(room)
+    if days is None:
+        found = set()
+        # KELAS 2.09 diblacklist Senin-Jumat
+        if any(room.endswith(suf) for suf in BLACKLIST_MON_FRI_SUFFIXES):
+            found.update(range(0, 5))
+        # Lainnya diblacklist Senin-Rabu
+        if any(room.endswith(suf) for suf in BLACKLIST_MON_WED_SUFFIXES):
+            found.update(range(0, 3))
+        days = _BLACKLIST_WEEKDAYS[room] = frozenset(found)
+    return days
 
 
 def is_room_blacklisted_on_date(room: str, date_dt: datetime) -> bool:
     """Return True jika ruangan diblacklist pada tanggal tersebut."""
-    if not is_within_uts_week(date_dt):
-        return False
-    weekday = date_dt.weekday()  # 0=Mon ... 4=Fri
-    # KELAS 2.09 diblacklist Senin-Jumat
-    for suf in BLACKLIST_MON_FRI_SUFFIXES:
-        if room.endswith(suf) and weekday <= 4:
-            return True
-    # Lainnya diblacklist Senin-Rabu
-    for suf in BLACKLIST_MON_WED_SUFFIXES:
-        if room.endswith(suf) and weekday <= 2:
-            return True
-    return False
+    weekday = UTS_WEEKDAY.get(date_dt.toordinal())
+    return weekday is not None and weekday in blacklisted_weekdays(room)
+
+
+# Urutan kolom tuple hasil build_schedule
+OUT_COLS = (
+    "HARI",
+    "TANGGAL",
+    "SHIFT",
+    "RUANGAN",
+    "KODE MATA KULIAH",
+    "NAMA MATA KULIAH",
+    "NAMA DOSEN",
+    "KELAS",
+    "BENTUK UJIAN",
+    "BUTUH MENGGANDAKAN SOAL",
+    "BUTUH LEMBAR JAWABAN KERJA",
+    "BUTUH PENGAWAS UJIAN",
+    "BUTUH RUANG KELAS",
+    "JUMLAH MAHASISWA",
+)
 
 
 # ============================ Aturan Khusus AULA ============================
 AULA_NAME = "AULA"
+# Urutan shift yang dipilih untuk AULA: Senin pagi dulu, hari lain siang dulu
+AULA_SHIFT_ORDER_MONDAY = (time(7, 30), time(10, 0), time(13, 0), time(15, 30))
+AULA_SHIFT_ORDER_OTHER = (time(13, 0), time(15, 30), time(7, 30), time(10, 0))
 
 def is_aula(room: str) -> bool:
     return room.strip().upper() == AULA_NAME
@@ -64,9 +103,7 @@ def is_aula_time_allowed(date_dt: datetime, start_dt: datetime, end_dt: datetime
       - Selasa (2025-11-04): hanya boleh mulai dari 13.00 ke atas (start >= 13.00)
     - Hari lain: TIDAK BOLEH dipakai
     """
-    if not is_within_uts_week(date_dt):
-        return False
-    weekday = date_dt.weekday()  # 0=Mon, 1=Tue
+    weekday = UTS_WEEKDAY.get(date_dt.toordinal())  # 0=Mon, 1=Tue; None di luar minggu UTS
     if weekday == 0:  # Senin
         return True
     if weekday == 1:  # Selasa
@@ -82,11 +119,12 @@ def aula_preferred_shifts(day_dt: datetime) -> list[tuple[datetime, datetime]]:
     """
     slots = generate_daily_shifts(day_dt)
     # map for easy lookup
-    if day_dt.weekday() == 0:  # Monday
-        order = [time(7, 30), time(10, 0), time(13, 0), time(15, 30)]
+    # Urutan Senin hanya untuk Senin minggu UTS (sama dengan aturan AULA di is_aula_time_allowed)
+    if UTS_WEEKDAY.get(day_dt.toordinal()) == 0:  # Monday
+        order = AULA_SHIFT_ORDER_MONDAY
     else:
         # Tuesday and others
-        order = [time(13, 0), time(15, 30), time(7, 30), time(10, 0)]
+        order = AULA_SHIFT_ORDER_OTHER
     by_start = {s[0].time(): s for s in slots}
     return [by_start[t] for t in order if t in by_start]
 
@@ -94,9 +132,10 @@ def aula_preferred_dates() -> list[datetime]:
     """Prefer Tuesday first, then Monday within the UTS week."""
     # Build list of allowed dates then reorder
     dates = list(iter_allowed_dates())
-    mon = [d for d in dates if d.weekday() == 0]  # Monday
-    tue = [d for d in dates if d.weekday() == 1]  # Tuesday
-    others = [d for d in dates if d.weekday() not in (0, 1)]
+    # Semua tanggal dari iter_allowed_dates ada di minggu UTS
+    mon = [d for d in dates if UTS_WEEKDAY[d.toordinal()] == 0]  # Monday
+    tue = [d for d in dates if UTS_WEEKDAY[d.toordinal()] == 1]  # Tuesday
+    others = [d for d in dates if UTS_WEEKDAY[d.toordinal()] not in (0, 1)]
     return mon + tue + others
 
 
@@ -155,6 +194,26 @@ def parse_csv(path: Path):
     return items
 
 
+def append_assignment(dst: list[tuple], hari: str, tanggal: str, shift: str, room: str, it: dict) -> None:
+    """Tambahkan satu baris output (urutan OUT_COLS) untuk item `it`."""
+    dst.append((
+        hari,
+        tanggal,
+        shift,
+        room,
+        it["kode_mk"],
+        it["nama_mk"],
+        it.get("nama_dosen", ""),
+        it["kelas"],
+        it.get("bentuk_ujian", ""),
+        it.get("butuh_gandakan", ""),
+        it.get("butuh_lembar", ""),
+        it.get("butuh_pengawas", ""),
+        it.get("butuh_ruang", ""),
+        it.get("jumlah_mhs", ""),
+    ))
+
+
 def load_rooms_from_csv(rooms_csv_path: Path) -> list[str]:
     """Load room names from ruangan-kampus.csv file."""
     rooms = []
@@ -202,17 +261,11 @@ def normalize_to_allowed_shift(date_dt: datetime, start_dt: datetime) -> tuple[d
     return best
 
 
+WEEKDAY_NAMES = ("SENIN", "SELASA", "RABU", "KAMIS", "JUM'AT", "SABTU", "MINGGU")
+
+
 def weekday_name(dt: datetime) -> str:
-    mapping = {
-        0: "SENIN",
-        1: "SELASA",
-        2: "RABU",
-        3: "KAMIS",
-        4: "JUM'AT",
-        5: "SABTU",
-        6: "MINGGU",
-    }
-    return mapping[dt.weekday()]
+    return WEEKDAY_NAMES[dt.weekday()]
 
 
 def iter_allowed_dates():
@@ -228,9 +281,8 @@ def parse_existing_datetime(hari: str, tanggal: str, shift: str) -> tuple[dateti
     if not tanggal or not shift:
         return None
     # Coba beberapa format tanggal
-    date_formats = ["%d-%b-%y", "%d/%m/%Y", "%d-%m-%Y"]
     date_dt = None
-    for fmt in date_formats:
+    for fmt in DATE_FORMATS:
         try:
             date_dt = datetime.strptime(tanggal.strip(), fmt)
             break
@@ -256,8 +308,19 @@ def parse_existing_datetime(hari: str, tanggal: str, shift: str) -> tuple[dateti
 
 def build_schedule(items: list[dict]):
     # State pemakaian: per (tanggal, shift_str) -> room->count pemakaian, dan kelas-> list times
-    room_usage = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))  # date_str -> shift_str -> room -> count
-    room_occupants = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))  # date_str -> shift_str -> room -> list kelas
+    # Okupansi ruangan: per (date_str, shift_str) satu list int berisi count pemakaian, berindeks posisi di ALL_ROOMS
+    # (bukan bytearray: jadwal existing bisa memakai satu ruangan lebih dari 255 kali di slot yang sama)
+    room_to_idx = {r: i for i, r in enumerate(ALL_ROOMS)}
+    aula_indices = [i for i, r in enumerate(ALL_ROOMS) if is_aula(r) and i == room_to_idx[r]]
+    occupancy: dict[tuple[str, str], list[int]] = {}
+    other_room_usage = defaultdict(int)  # (date_str, shift_str, room) -> count, untuk ruangan di luar ALL_ROOMS
+    allowed_mask: dict[str, list[int]] = {}  # date_str -> index ruangan non-AULA yang tidak diblacklist
+    # Antrian ruangan non-AULA yang (mungkin) masih kosong per (date_str, shift_str), diacak sekali.
+    # Ruangan yang sudah terpakai dibuang saat di-pop, jadi probe berikutnya tidak men-scan ulang.
+    free_rooms: dict[tuple[str, str], deque[int]] = {}
+    aula_first_prefix: dict[tuple[str, str], str] = {}  # (date_str, shift_str) -> prefix kelas pertama di AULA
+    # Slot AULA yang baru terisi 1 kelas, dikelompokkan per prefix kelas penghuni pertamanya
+    aula_half_full_by_prefix: dict[str, list[tuple[str, str]]] = defaultdict(list)
     class_usage = defaultdict(list)  # kelas -> list[(start_dt,end_dt)]
     class_daily_count = defaultdict(lambda: defaultdict(int))  # kelas -> date_str -> count
     # Track tanggal yang sudah dipakai per kode mata kuliah untuk prefer same-day scheduling
@@ -265,6 +328,31 @@ def build_schedule(items: list[dict]):
     # Juga simpan count per tanggal agar bisa memadatkan di tanggal yang paling banyak dipakai
     course_date_counts = defaultdict(lambda: defaultdict(int))  # kode_mk -> date_str -> count
 
+    def room_count(date_key: str, shift_key: str, room: str) -> int:
+        i = room_to_idx.get(room)
+        if i is None:
+            return other_room_usage.get((date_key, shift_key, room), 0)
+        occ = occupancy.get((date_key, shift_key))
+        return occ[i] if occ is not None else 0
+
+    def add_room_usage(date_key: str, shift_key: str, room: str, kelas: str) -> None:
+        i = room_to_idx.get(room)
+        if i is None:
+            other_room_usage[(date_key, shift_key, room)] += 1
+        else:
+            occ = occupancy.get((date_key, shift_key))
+            if occ is None:
+                occ = occupancy[(date_key, shift_key)] = [0] * len(ALL_ROOMS)
+            occ[i] += 1
+        if room == AULA_NAME:
+            slot = (date_key, shift_key)
+            count = room_count(date_key, shift_key, room)
+            if count == 1 and kelas[:2]:
+                aula_first_prefix[slot] = kelas[:2]
+                aula_half_full_by_prefix[kelas[:2]].append(slot)
+            elif count == 2 and slot in aula_first_prefix:
+                aula_half_full_by_prefix[aula_first_prefix[slot]].remove(slot)
+
     # Kumpulkan existing jadwal bila ada
     for it in items:
         if it["tanggal"] and it["shift"]:
@@ -280,10 +368,7 @@ def build_schedule(items: list[dict]):
                 class_daily_count[cls][date_key] += 1
             room = it["ruangan"].strip() if it["ruangan"] else ""
             if room:
-                room_usage[date_key][shift_key][room] += 1
-                cls_for_occ = it.get("kelas", "")
-                if cls_for_occ:
-                    room_occupants[date_key][shift_key][room].append(cls_for_occ)
+                add_room_usage(date_key, shift_key, room, it.get("kelas", ""))
             # Mark tanggal yang sudah terpakai oleh kode mk ini
             kode_exist = it.get("kode_mk", "")
             if kode_exist:
@@ -292,7 +377,7 @@ def build_schedule(items: list[dict]):
 
     # Siapkan daftar shifts harian (dipakai untuk mengisi yang kosong)
     # Kita generate untuk beberapa hari ke depan (misal 14 hari) sampai kebutuhan terpenuhi
-    generated_assignments: list[dict] = []
+    generated_assignments: list[tuple] = []  # baris output, urutan kolom = OUT_COLS
 
     def is_class_conflict(kelas: str, start_dt: datetime, end_dt: datetime) -> bool:
         if not kelas:
@@ -310,45 +395,49 @@ def build_schedule(items: list[dict]):
             
         return False
 
+    # Ambil satu ruangan non-AULA yang masih kosong dari antrian slot (sudah diacak)
+    def take_free_room(date_dt: datetime, date_key: str, shift_key: str) -> str | None:
+        free = free_rooms.get((date_key, shift_key))
+        if free is None:
+            allowed = allowed_mask.get(date_key)
+            if allowed is None:
+                # Nama ruangan duplikat di CSV: hanya index yang dipakai room_to_idx (count dicatat di sana)
+                allowed = [
+                    i for i, r in enumerate(ALL_ROOMS)
+                    if i == room_to_idx[r] and not is_aula(r) and not is_room_blacklisted_on_date(r, date_dt)
+                ]
+                allowed_mask[date_key] = allowed
+            free = free_rooms[(date_key, shift_key)] = deque(random.sample(allowed, len(allowed)))
+        occ = occupancy.get((date_key, shift_key))
+        while free:
+            i = free.popleft()
+            # Ruangan bisa sudah terisi lewat RUANGAN yang ditentukan CSV
+            if occ is None or not occ[i]:
+                return ALL_ROOMS[i]
+        return None
+
     # Fungsi memilih ruangan kosong pada tanggal+shift tertentu (memperhatikan blacklist per tanggal)
     def pick_free_room(date_dt: datetime, date_key: str, shift_key: str, start_dt: datetime, end_dt: datetime, bentuk_ujian: str, allow_aula: bool, jumlah_mhs: int = 0) -> str | None:
-        used_counts = room_usage[date_key][shift_key]
+        occ = occupancy.get((date_key, shift_key))
         aula_candidates = []
-        normal_candidates = []
-        for r in ALL_ROOMS:
-            if is_room_blacklisted_on_date(r, date_dt):
-                continue
-            count = used_counts.get(r, 0)
-            if is_aula(r):
-                if not allow_aula:
-                    continue
-                # AULA hanya untuk ujian tulis dengan jumlah_mhs diketahui (>0)
-                bentuk = (bentuk_ujian or "").strip().lower()
-                if bentuk != "ujian tulis" or jumlah_mhs <= 0 or jumlah_mhs < 40:
-                    continue
-                # AULA boleh hingga 2 kelas per shift, dan patuhi aturan waktu khusus
-                if count < 2 and is_aula_time_allowed(date_dt, start_dt, end_dt):
-                    aula_candidates.append(r)
-            else:
-                if count == 0:
-                    normal_candidates.append(r)
-        if not aula_candidates and not normal_candidates:
-            return None
+        # AULA hanya untuk ujian tulis dengan jumlah_mhs diketahui (>= 40),
+        # boleh hingga 2 kelas per shift, dan patuhi aturan waktu khusus
         bentuk = (bentuk_ujian or "").strip().lower()
+        if allow_aula and bentuk == "ujian tulis" and jumlah_mhs >= 40 and is_aula_time_allowed(date_dt, start_dt, end_dt):
+            for i in aula_indices:
+                if (occ is None or occ[i] < 2) and not is_room_blacklisted_on_date(ALL_ROOMS[i], date_dt):
+                    aula_candidates.append(ALL_ROOMS[i])
         is_tulis = bentuk == "ujian tulis" and jumlah_mhs > 0 and jumlah_mhs >= 40
         if is_tulis:
             # Prioritaskan AULA dulu
             if aula_candidates:
                 return AULA_NAME if AULA_NAME in aula_candidates else random.choice(aula_candidates)
-            if normal_candidates:
-                return random.choice(normal_candidates)
-        else:
-            # Non-"Ujian Tulis": gunakan ruangan biasa dulu, AULA sebagai fallback
-            if normal_candidates:
-                return random.choice(normal_candidates)
-            if aula_candidates:
-                return AULA_NAME if AULA_NAME in aula_candidates else random.choice(aula_candidates)
-        return None
+            return take_free_room(date_dt, date_key, shift_key)
+        # Non-"Ujian Tulis": gunakan ruangan biasa dulu, AULA sebagai fallback
+        room = take_free_room(date_dt, date_key, shift_key)
+        if room is None and aula_candidates:
+            room = AULA_NAME if AULA_NAME in aula_candidates else random.choice(aula_candidates)
+        return room
 
     # Helper: iterate allowed dates and shifts until assignable
 
@@ -359,10 +448,9 @@ def build_schedule(items: list[dict]):
         except Exception:
             return 0
 
-    items_with_index = list(enumerate(items))
-
-    def sort_key(entry):
-        _, it0 = entry
+    # Kunci urut dihitung sekali per item (bukan lewat closure sort_key)
+    sort_keys = []
+    for it0 in items:
         bentuk0 = (it0.get("bentuk_ujian", "") or "").strip().lower()
         is_tulis0 = bentuk0 == "ujian tulis"
         has_shift0 = bool(
@@ -370,19 +458,30 @@ def build_schedule(items: list[dict]):
             and (it0.get("tanggal") or "").strip()
             and (it0.get("shift") or "").strip()
         )
-        kelas0 = (it0.get("kelas", "") or "").strip()
-        prefix0 = kelas0[:2]
+        prefix0 = (it0.get("kelas", "") or "").strip()[:2]
         mhs0 = parse_int_safe(it0.get("jumlah_mhs", "0"))
         # AULA candidate: Ujian Tulis and no pre-defined shift
         aula_cand = (is_tulis0 and not has_shift0)
         # Sort: AULA candidates first (1), then prefix, then jumlah desc
-        return (1 if aula_cand else 0, prefix0, -mhs0)
-
-    items_with_index.sort(key=sort_key, reverse=False)
+        sort_keys.append((1 if aula_cand else 0, prefix0, -mhs0))
+    order = sorted(range(len(items)), key=sort_keys.__getitem__)
+    items_with_index = [(i, items[i]) for i in order]
+
+    # Slot (tanggal x shift) kandidat: urutan biasa dan urutan preferensi AULA
+    daily_slots = [
+        (day_dt, s_start, s_end, s_start.strftime("%Y-%m-%d"), format_time_range(s_start, s_end))
+        for day_dt in iter_allowed_dates()
+        for s_start, s_end in generate_daily_shifts(day_dt)
+    ]
+    aula_slots = [
+        (day_dt, s_start, s_end, s_start.strftime("%Y-%m-%d"), format_time_range(s_start, s_end))
+        for day_dt in aula_preferred_dates()
+        for s_start, s_end in aula_preferred_shifts(day_dt)
+    ]
+    aula_slot_rank = {(slot[3], slot[4]): rank for rank, slot in enumerate(aula_slots)}
 
     for _, it in items_with_index:
         kode = it["kode_mk"]
-        nama = it["nama_mk"]
         kelas = it["kelas"]
         hari = it["hari"].strip().upper() if it["hari"] else ""
         tanggal = it["tanggal"].strip() if it["tanggal"] else ""
@@ -404,30 +503,13 @@ def build_schedule(items: list[dict]):
                     class_daily_count[kelas][date_key] += 1
                 room = ruangan.strip()
                 if room:
-                    room_usage[date_key][shift_key_state][room] += 1
-                    if kelas:
-                        room_occupants[date_key][shift_key_state][room].append(kelas)
+                    add_room_usage(date_key, shift_key_state, room, kelas)
                 # Tandai tanggal terpakai untuk kode ini
                 if kode:
                     course_used_dates[kode].add(date_key)
                     course_date_counts[kode][date_key] += 1
             # Tulis PERSIS seperti CSV
-            generated_assignments.append({
-                "HARI": it["hari"],
-                "TANGGAL": it["tanggal"],
-                "SHIFT": it["shift"],
-                "RUANGAN": it["ruangan"],
-                "KODE MATA KULIAH": kode,
-                "NAMA MATA KULIAH": nama,
-                "NAMA DOSEN": it.get("nama_dosen", ""),
-                "KELAS": kelas,
-                "BENTUK UJIAN": it.get("bentuk_ujian", ""),
-                "BUTUH MENGGANDAKAN SOAL": it.get("butuh_gandakan", ""),
-                "BUTUH LEMBAR JAWABAN KERJA": it.get("butuh_lembar", ""),
-                "BUTUH PENGAWAS UJIAN": it.get("butuh_pengawas", ""),
-                "BUTUH RUANG KELAS": it.get("butuh_ruang", ""),
-                "JUMLAH MAHASISWA": it.get("jumlah_mhs", ""),
-            })
+            append_assignment(generated_assignments, it["hari"], it["tanggal"], it["shift"], it["ruangan"], it)
             continue
 
         # Jika hari, tanggal, shift sudah ada: JANGAN ubah waktu. Hanya carikan ruangan jika kosong.
@@ -445,29 +527,12 @@ def build_schedule(items: list[dict]):
                 class_usage[kelas].append((start_dt, end_dt))
                 class_daily_count[kelas][date_key] += 1
             if room:
-                room_usage[date_key][shift_key][room] += 1
-                if kelas:
-                    room_occupants[date_key][shift_key][room].append(kelas)
+                add_room_usage(date_key, shift_key, room, kelas)
             # Tandai tanggal terpakai untuk kode ini
             if kode:
                 course_used_dates[kode].add(date_key)
                 course_date_counts[kode][date_key] += 1
-            generated_assignments.append({
-                "HARI": weekday_name(start_dt),
-                "TANGGAL": start_dt.strftime("%d-%b-%y"),
-                "SHIFT": shift_key,
-                "RUANGAN": room,
-                "KODE MATA KULIAH": kode,
-                "NAMA MATA KULIAH": nama,
-                "NAMA DOSEN": it.get("nama_dosen", ""),
-                "KELAS": kelas,
-                "BENTUK UJIAN": it.get("bentuk_ujian", ""),
-                "BUTUH MENGGANDAKAN SOAL": it.get("butuh_gandakan", ""),
-                "BUTUH LEMBAR JAWABAN KERJA": it.get("butuh_lembar", ""),
-                "BUTUH PENGAWAS UJIAN": it.get("butuh_pengawas", ""),
-                "BUTUH RUANG KELAS": it.get("butuh_ruang", ""),
-                "JUMLAH MAHASISWA": it.get("jumlah_mhs", ""),
-            })
+            append_assignment(generated_assignments, weekday_name(start_dt), start_dt.strftime("%d-%b-%y"), shift_key, room, it)
             continue
 
         # Jika belum ada hari/tanggal/shift, generate baru
@@ -496,7 +561,7 @@ def build_schedule(items: list[dict]):
                     if ruangan:
                         if is_room_blacklisted_on_date(ruangan, s_start):
                             continue
-                        current = room_usage[date_key0][shift_key0].get(ruangan, 0)
+                        current = room_count(date_key0, shift_key0, ruangan)
                         if is_aula(ruangan):
                             if not (is_aula_time_allowed(day_dt, s_start, s_end) and current < 2):
                                 continue
@@ -511,25 +576,8 @@ def build_schedule(items: list[dict]):
                         continue
                     class_usage[kelas].append((s_start, s_end))
                     class_daily_count[kelas][date_key0] += 1
-                    room_usage[date_key0][shift_key0][room] += 1
-                    if kelas:
-                        room_occupants[date_key0][shift_key0][room].append(kelas)
-                    generated_assignments.append({
-                        "HARI": weekday_name(s_start),
-                        "TANGGAL": s_start.strftime("%d-%b-%y"),
-                        "SHIFT": shift_key0,
-                        "RUANGAN": room,
-                        "KODE MATA KULIAH": kode,
-                        "NAMA MATA KULIAH": nama,
-                        "NAMA DOSEN": it.get("nama_dosen", ""),
-                        "KELAS": kelas,
-                        "BENTUK UJIAN": it.get("bentuk_ujian", ""),
-                        "BUTUH MENGGANDAKAN SOAL": it.get("butuh_gandakan", ""),
-                        "BUTUH LEMBAR JAWABAN KERJA": it.get("butuh_lembar", ""),
-                        "BUTUH PENGAWAS UJIAN": it.get("butuh_pengawas", ""),
-                        "BUTUH RUANG KELAS": it.get("butuh_ruang", ""),
-                        "JUMLAH MAHASISWA": it.get("jumlah_mhs", ""),
-                    })
+                    add_room_usage(date_key0, shift_key0, room, kelas)
+                    append_assignment(generated_assignments, weekday_name(s_start), s_start.strftime("%d-%b-%y"), shift_key0, room, it)
                     # Tandai tanggal terpakai untuk kode ini
                     course_used_dates[kode].add(date_key0)
                     course_date_counts[kode][date_key0] += 1
@@ -540,137 +588,48 @@ def build_schedule(items: list[dict]):
             if assigned:
                 continue
 
-        # 1) Coba pairing ke AULA yang sudah punya 1 slot terisi terlebih dahulu (prefer prefix sama)
-        #    Hanya untuk BENTUK UJIAN = "Ujian Tulis"
-        #    Hanya untuk tanggal/shift yang kompatibel dengan kelas ini (tidak konflik) dan aturan AULA.
-        for day_dt in aula_preferred_dates():
-            for s_start, s_end in aula_preferred_shifts(day_dt):
-                if is_class_conflict(kelas, s_start, s_end):
-                    continue
-                date_key = s_start.strftime("%Y-%m-%d")
-                shift_key = format_time_range(s_start, s_end)
-                # Cari AULA yang masih count < 2 dan waktu diizinkan
-                counts = room_usage[date_key][shift_key]
-                aula_count = counts.get(AULA_NAME, 0)
-                if (bentuk_ujian.strip().lower() == "ujian tulis") and jumlah_mhs_val >= 40 and aula_count == 1 and is_aula_time_allowed(day_dt, s_start, s_end):
-                    # Prefer jika prefix kelas sama
-                    occupants = room_occupants[date_key][shift_key][AULA_NAME]
-                    prefer = False
-                    if occupants:
-                        try:
-                            pref_new = (kelas or "")[:2]
-                            pref_old = (occupants[0] or "")[:2]
-                            prefer = bool(pref_new) and bool(pref_old) and pref_new == pref_old
-                        except Exception:
-                            prefer = False
-                    # Wajib sama prefix untuk mengisi slot kedua AULA
-                    if not prefer:
-                        continue
-                    
-                    room = AULA_NAME
-                    class_usage[kelas].append((s_start, s_end))
-                    class_daily_count[kelas][date_key] += 1
-                    room_usage[date_key][shift_key][room] += 1
-                    if kelas:
-                        room_occupants[date_key][shift_key][room].append(kelas)
-                    generated_assignments.append({
-                        "HARI": weekday_name(s_start),
-                        "TANGGAL": s_start.strftime("%d-%b-%y"),
-                        "SHIFT": shift_key,
-                        "RUANGAN": room,
-                        "KODE MATA KULIAH": kode,
-                        "NAMA MATA KULIAH": nama,
-                        "NAMA DOSEN": it.get("nama_dosen", ""),
-                        "KELAS": kelas,
-                        "BENTUK UJIAN": it.get("bentuk_ujian", ""),
-                        "BUTUH MENGGANDAKAN SOAL": it.get("butuh_gandakan", ""),
-                        "BUTUH LEMBAR JAWABAN KERJA": it.get("butuh_lembar", ""),
-                        "BUTUH PENGAWAS UJIAN": it.get("butuh_pengawas", ""),
-                        "BUTUH RUANG KELAS": it.get("butuh_ruang", ""),
-                        "JUMLAH MAHASISWA": it.get("jumlah_mhs", ""),
-                    })
-                    assigned = True
-                    break
-            if assigned:
-                break
-
-        if assigned:
-            continue
-
-        # 2) Alokasi normal (memungkinkan AULA dengan kapasitas 2)
+        # Satu sweep atas kandidat slot, urut prioritas:
+        # 1) Pairing ke AULA yang sudah punya 1 slot terisi (wajib prefix kelas sama).
+        #    Hanya untuk BENTUK UJIAN = "Ujian Tulis" dan slot yang masih sesuai aturan AULA.
+        # 2) Alokasi normal (memungkinkan AULA dengan kapasitas 2).
+        pair_ranks: list[int] = []
+        pref_new = (kelas or "")[:2]
+        half_full = aula_half_full_by_prefix.get(pref_new) if pref_new else None
+        if half_full and bentuk_ujian.strip().lower() == "ujian tulis" and jumlah_mhs_val >= 40:
+            pair_ranks = sorted(aula_slot_rank[k] for k in half_full if k in aula_slot_rank)
         is_aula_candidate = (bentuk_ujian.strip().lower() == "ujian tulis" and jumlah_mhs_val > 0)
-        date_iter = aula_preferred_dates() if is_aula_candidate else iter_allowed_dates()
-        for day_dt in date_iter:
-            shift_iter = aula_preferred_shifts(day_dt) if is_aula_candidate else generate_daily_shifts(day_dt)
-            for s_start, s_end in shift_iter:
-                if is_class_conflict(kelas, s_start, s_end):
+        grid = aula_slots if is_aula_candidate else daily_slots
+        candidates = chain(((aula_slots[rank], True) for rank in pair_ranks), ((slot, False) for slot in grid))
+        for (day_dt, s_start, s_end, date_key, shift_key), pair in candidates:
+            if is_class_conflict(kelas, s_start, s_end):
+                continue
+            if pair:
+                if not is_aula_time_allowed(day_dt, s_start, s_end):
                     continue
-                date_key = s_start.strftime("%Y-%m-%d")
-                shift_key = format_time_range(s_start, s_end)
-                # Jika CSV sudah menspesifikkan ruangan, coba pakai ruangan itu saja
-                if ruangan:
-                    # Hanya assign jika ruangan tersebut belum dipakai pada slot ini
-                    if not is_room_blacklisted_on_date(ruangan, s_start):
-                        current = room_usage[date_key][shift_key].get(ruangan, 0)
-                        if is_aula(ruangan):
-                            if is_aula_time_allowed(day_dt, s_start, s_end) and current < 2:
-                                room = ruangan
-                            else:
-                                continue
-                        else:
-                            if current == 0:
-                                room = ruangan
-                            else:
-                                continue
-                    else:
-                        # Slot ini tidak tersedia untuk ruangan yang diminta, coba slot berikutnya
+                room = AULA_NAME
+            elif ruangan:
+                # Jika CSV sudah menspesifikkan ruangan, hanya assign jika ruangan itu belum dipakai pada slot ini
+                if is_room_blacklisted_on_date(ruangan, s_start):
+                    continue
+                current = room_count(date_key, shift_key, ruangan)
+                if is_aula(ruangan):
+                    if not (is_aula_time_allowed(day_dt, s_start, s_end) and current < 2):
                         continue
-                else:
-                    room = pick_free_room(s_start, date_key, shift_key, s_start, s_end, bentuk_ujian, True, jumlah_mhs_val)
-                if room:
-                    class_usage[kelas].append((s_start, s_end))
-                    class_daily_count[kelas][date_key] += 1
-                    room_usage[date_key][shift_key][room] += 1
-                    if kelas:
-                        room_occupants[date_key][shift_key][room].append(kelas)
-                    generated_assignments.append({
-                        "HARI": weekday_name(s_start),
-                        "TANGGAL": s_start.strftime("%d-%b-%y"),
-                        "SHIFT": shift_key,
-                        "RUANGAN": room,
-                        "KODE MATA KULIAH": kode,
-                        "NAMA MATA KULIAH": nama,
-                        "NAMA DOSEN": it.get("nama_dosen", ""),
-                        "KELAS": kelas,
-                        "BENTUK UJIAN": it.get("bentuk_ujian", ""),
-                        "BUTUH MENGGANDAKAN SOAL": it.get("butuh_gandakan", ""),
-                        "BUTUH LEMBAR JAWABAN KERJA": it.get("butuh_lembar", ""),
-                        "BUTUH PENGAWAS UJIAN": it.get("butuh_pengawas", ""),
-                        "BUTUH RUANG KELAS": it.get("butuh_ruang", ""),
-                        "JUMLAH MAHASISWA": it.get("jumlah_mhs", ""),
-                    })
-                    assigned = True
-                    break
-            if assigned:
-                break
-        if not assigned:
+                elif current != 0:
+                    continue
+                room = ruangan
+            else:
+                room = pick_free_room(s_start, date_key, shift_key, s_start, s_end, bentuk_ujian, True, jumlah_mhs_val)
+                if not room:
+                    continue
+            class_usage[kelas].append((s_start, s_end))
+            class_daily_count[kelas][date_key] += 1
+            add_room_usage(date_key, shift_key, room, kelas)
+            append_assignment(generated_assignments, weekday_name(s_start), s_start.strftime("%d-%b-%y"), shift_key, room, it)
+            break
+        else:
             # gagal assign, tetap keluarkan tanpa ruangan
-            generated_assignments.append({
-                "HARI": "",
-                "TANGGAL": "",
-                "SHIFT": "",
-                "RUANGAN": "",
-                "KODE MATA KULIAH": kode,
-                "NAMA MATA KULIAH": nama,
-                "NAMA DOSEN": it.get("nama_dosen", ""),
-                "KELAS": kelas,
-                "BENTUK UJIAN": it.get("bentuk_ujian", ""),
-                "BUTUH MENGGANDAKAN SOAL": it.get("butuh_gandakan", ""),
-                "BUTUH LEMBAR JAWABAN KERJA": it.get("butuh_lembar", ""),
-                "BUTUH PENGAWAS UJIAN": it.get("butuh_pengawas", ""),
-                "BUTUH RUANG KELAS": it.get("butuh_ruang", ""),
-                "JUMLAH MAHASISWA": it.get("jumlah_mhs", ""),
-            })
+            append_assignment(generated_assignments, "", "", "", "", it)
 
     return generated_assignments
 
@@ -689,16 +648,16 @@ def write_outputs(assignments, out_csv: Path, out_xlsx: Path | None):
         "BENTUK UJIAN",
         "JUMLAH MAHASISWA",
     ]
+    pick = itemgetter(*(OUT_COLS.index(c) for c in cols))
     with out_csv.open("w", encoding="utf-8", newline="") as f:
         w = csv.writer(f)
         w.writerow(cols)
-        for row in assignments:
-            w.writerow([row.get(c, "") for c in cols])
+        w.writerows(map(pick, assignments))
 
     if pd is not None and out_xlsx is not None:
         try:
             # Tuliskan menggunakan pandas
-            df = pd.DataFrame(assignments, columns=cols)
+            df = pd.DataFrame(assignments, columns=OUT_COLS)[cols]
             # Prioritaskan xlsxwriter agar bisa insert checkbox
             try:
                 with pd.ExcelWriter(out_xlsx, engine="xlsxwriter") as writer:  # type: ignore